@@ -34,11 +34,13 @@ export function CameraScreen() {
 
   const [hasPermission, setHasPermission] = useState<boolean | null>(null);
   const [photo, setPhoto] = useState<string | null>(null);
+  const [uploadedPhotoUrl, setUploadedPhotoUrl] = useState<string | null>(null); // Set when detection already uploaded the photo
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [detectedObjects, setDetectedObjects] = useState<string[]>([]);
   const [selectedTags, setSelectedTags] = useState<string[]>([]);
   const [error, setError] = useState<string | null>(null);
   const [isSubmitting, setIsSubmitting] = useState(false); // Prevent multiple submissions
+  const submitKeyRef = useRef<string | null>(null); // Same key on retry so the backend never stores the turn twice
 
   // Animation values for sci-fi effects
   const scanLineAnim = useRef(new Animated.Value(0)).current;
@@ -116,6 +118,7 @@ export function CameraScreen() {
         try {
           const result = await GameAPI.detectObjects(croppedPhoto);
           const objects = result.labels.slice(0, 20);
+          setUploadedPhotoUrl(result.photo_url || null);
           
           if (objects.length === 0) {
             setError('NO OBJECTS DETECTED — RETAKE SPECIMEN');
@@ -176,6 +179,8 @@ export function CameraScreen() {
 
   const retakePicture = () => {
     setPhoto(null);
+    setUploadedPhotoUrl(null);
+    submitKeyRef.current = null;
     setDetectedObjects([]);
     setSelectedTags([]);
     setError(null);
@@ -293,14 +298,18 @@ export function CameraScreen() {
 
       const submissionData = {
         player_name: playerName,
-        photo_url: photo,
+        photo_url: uploadedPhotoUrl || photo,
         tags: finalTags,
         shared_tag: sharedTag,
         detected_tags: detectedObjects,
       };
 
+      if (!submitKeyRef.current) {
+        submitKeyRef.current = `${gameId}-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      }
+
       console.log('📡 Making API call...');
-      await GameAPI.submitTurn(gameId, submissionData);
+      await GameAPI.submitTurn(gameId, submissionData, submitKeyRef.current);
 
       console.log('✅ Turn submitted successfully');
       Alert.alert('SUCCESS', 'Analysis submitted successfully!', [
@@ -40,16 +40,10 @@ export function DashboardScreen() {
 
       const gameIds = await Storage.getGameIds();
       
-      // Load games individually to avoid Promise.all failing if one game fails
-      const gamesData = [];
-      for (const id of gameIds) {
-        try {
-          const game = await GameAPI.getGame(id);
-          gamesData.push(game);
-        } catch (gameError) {
-          console.warn(`Failed to load game ${id}:`, gameError);
-          // Continue with other games, don't fail entirely
-        }
+      // One batched request; games that no longer exist come back as missing
+      const { games: gamesData, missing } = await GameAPI.getGames(gameIds, true);
+      if (missing.length) {
+        console.warn('Games not found:', missing);
       }
       
       setGames(gamesData);
@@ -112,7 +106,7 @@ export function DashboardScreen() {
   };
 
   const getGameStatus = (game: Game) => {
-    const turns = game.turns?.length || 0;
+    const turns = game.turnCount ?? game.turns?.length ?? 0;
     const isPlayer1 = playerName === game.player1Name;
     const isPlayer2 = playerName === game.player2Name;
     const myTurn = (isPlayer1 && turns % 2 === 0) || (isPlayer2 && turns % 2 === 1);
@@ -228,7 +222,7 @@ export function DashboardScreen() {
                 {games.map((game) => {
                   const status = getGameStatus(game);
                   const statusColor = getStatusColor(status);
-                  const turns = game.turns?.length || 0;
+                  const turns = game.turnCount ?? game.turns?.length ?? 0;
                   
                   return (
                     <View key={game.id} style={styles.gameCard}>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import {
   View,
   Text,
@@ -34,6 +34,9 @@ export function GameScreen() {
   const [game, setGame] = useState<Game | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  // Latest game for callbacks, so they don't change (and re-run effects) on every update
+  const gameRef = useRef<Game | null>(null);
+  gameRef.current = game;
 
   // Load game data
   const loadGame = useCallback(async () => {
@@ -66,6 +69,38 @@ export function GameScreen() {
     loadGame();
   }, [loadGame]);
 
+  // Append turns we haven't seen yet, fetching any gap since our last known turn
+  const applyNewTurn = useCallback(async (turn?: Turn) => {
+    const game = gameRef.current;
+    const known = game?.turns || [];
+    const lastKnown = known.length ? known[known.length - 1].turnNumber : 0;
+    if (!game || (turn && turn.turnNumber <= lastKnown)) {
+      return;
+    }
+
+    try {
+      let newTurns: Turn[];
+      if (turn && turn.turnNumber === lastKnown + 1) {
+        newTurns = [turn];
+      } else {
+        const delta = await GameAPI.getTurns(gameId, lastKnown);
+        if (delta.has_more) {
+          await loadGame();
+          return;
+        }
+        newTurns = delta.turns;
+      }
+      setGame(current => {
+        if (!current) return current;
+        const seen = new Set((current.turns || []).map(t => t.turnNumber));
+        return { ...current, turns: [...(current.turns || []), ...newTurns.filter(t => !seen.has(t.turnNumber))] };
+      });
+    } catch (error) {
+      console.error('Error applying new turn:', error);
+      loadGame();
+    }
+  }, [gameId, loadGame]);
+
   // WebSocket connection for real-time updates
   useEffect(() => {
     if (!gameId) return;
@@ -76,6 +111,10 @@ export function GameScreen() {
     const handleMessage = (message: any) => {
       console.log('🔔 WebSocket message received:', message);
       
+      if (message.type === 'reset') {
+        loadGame(); // Missed events couldn't be replayed; reload the whole game
+      }
+      
       if (message.type === 'player_joined') {
         Alert.alert('Player Joined!', `${message.player_name} joined the session!`);
         loadGame(); // Reload to show updated game state
@@ -83,7 +122,7 @@ export function GameScreen() {
       
       if (message.type === 'turn_submitted') {
         Alert.alert('Turn Submitted!', `${message.player_name} submitted their analysis!`);
-        loadGame(); // Reload to show new turn
+        applyNewTurn(message.turn); // Apply the new turn without refetching the game
       }
     };
     
@@ -139,7 +178,7 @@ export function GameScreen() {
       </Text>
       <View style={styles.imageContainer}>
         <Image 
-          source={{ uri: turn.photoUrl }} 
+          source={{ uri: turn.photoVariants?.medium || turn.photoUrl }} 
           style={styles.cardImage}
           resizeMode="cover"
         />
@@ -1,4 +1,3 @@
-import * as FileSystem from 'expo-file-system';
 import { Game, Turn, DetectionResult } from '../types/game';
 import { MockGameAPI } from './mockApi';
 
@@ -9,6 +8,9 @@ const LLM_API_URL = process.env.EXPO_PUBLIC_LLM_URL || 'https://twovue-mobile-pr
 // Set to false to use live API (Railway deployment)
 const USE_MOCK_API = false;
 
+// Last game state per game, revalidated with If-None-Match so unchanged boards come back as 304
+const gameETags = new Map<string, { etag: string; game: Game }>();
+
 export class GameAPI {
   static async createGame(player1Name: string): Promise<{ game_id: string }> {
     if (USE_MOCK_API) {
@@ -33,12 +35,71 @@ export class GameAPI {
       return MockGameAPI.getGame(gameId);
     }
     
-    const response = await fetch(`${API_BASE_URL}/games/${gameId}`);
+    const cached = gameETags.get(gameId);
+    const response = await fetch(`${API_BASE_URL}/games/${gameId}`, {
+      headers: cached ? { 'If-None-Match': cached.etag } : {},
+    });
+    
+    if (response.status === 304 && cached) {
+      return cached.game;
+    }
     
     if (!response.ok) {
       throw new Error('Failed to fetch game');
     }
     
+    const game: Game = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+      gameETags.set(gameId, { etag, game });
+    }
+    return game;
+  }
+
+  // Several games in one request; summary skips the turn lists and returns turnCount instead
+  static async getGames(gameIds: string[], summary = false): Promise<{ games: Game[]; missing: string[] }> {
+    if (USE_MOCK_API) {
+      const results = await Promise.allSettled(gameIds.map(id => MockGameAPI.getGame(id)));
+      return {
+        games: results.flatMap(result => (result.status === 'fulfilled' ? [result.value] : [])),
+        missing: gameIds.filter((_, i) => results[i].status === 'rejected'),
+      };
+    }
+    
+    const games: Game[] = [];
+    const missing: string[] = [];
+    // The backend takes at most 100 ids per request
+    for (let start = 0; start < gameIds.length; start += 100) {
+      const response = await fetch(`${API_BASE_URL}/games/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ game_ids: gameIds.slice(start, start + 100), summary }),
+      });
+      
+      if (!response.ok) {
+        throw new Error('Failed to fetch games');
+      }
+      
+      const page: { games: Game[]; missing: string[] } = await response.json();
+      games.push(...page.games);
+      missing.push(...page.missing);
+    }
+    return { games, missing };
+  }
+
+  // Turns after the given turn number, for catching up without refetching the whole game
+  static async getTurns(gameId: string, after: number): Promise<{ turns: Turn[]; next_after: number; has_more: boolean; last_turn_number: number }> {
+    if (USE_MOCK_API) {
+      const turns = ((await MockGameAPI.getGame(gameId)).turns || []).filter(turn => turn.turnNumber > after);
+      return { turns, next_after: turns.length ? turns[turns.length - 1].turnNumber : after, has_more: false, last_turn_number: after + turns.length };
+    }
+    
+    const response = await fetch(`${API_BASE_URL}/games/${gameId}/turns?after=${after}`);
+    
+    if (!response.ok) {
+      throw new Error('Failed to fetch turns');
+    }
+    
     return response.json();
   }
 
@@ -96,7 +157,8 @@ export class GameAPI {
       tags: string[];
       shared_tag: string;
       detected_tags: string[];
-    }
+    },
+    idempotencyKey?: string
   ): Promise<void> {
     if (USE_MOCK_API) {
       return MockGameAPI.submitTurn(gameId, turnData);
@@ -108,9 +170,14 @@ export class GameAPI {
       photoUrl = await this.uploadPhoto(photoUrl);
     }
     
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+    if (idempotencyKey) {
+      headers['Idempotency-Key'] = idempotencyKey;
+    }
+
     const response = await fetch(`${API_BASE_URL}/games/${gameId}/turns`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers,
       body: JSON.stringify({
         ...turnData,
         photo_url: photoUrl,
@@ -122,13 +189,8 @@ export class GameAPI {
     }
   }
 
-  static async detectObjects(photoUri: string): Promise<{ labels: string[]; debug?: any; raw_response?: string }> {
+  static async detectObjects(photoUri: string): Promise<{ labels: string[]; photo_url?: string; debug?: any; raw_response?: string }> {
     try {
-      // Convert photo to base64
-      const base64 = await FileSystem.readAsStringAsync(photoUri, {
-        encoding: FileSystem.EncodingType.Base64,
-      });
-
       if (USE_MOCK_API) {
         // Fallback to mock data
         const mockObjects = [
@@ -144,13 +206,21 @@ export class GameAPI {
       }
       
       console.log('🔍 Calling live API:', LLM_API_URL);
-      console.log('📱 Base64 length:', base64.length);
       
-      // Use live API
-      const response = await fetch(`${LLM_API_URL}/detect-llm`, {
+      // Upload the photo once: the server stores it and runs detection on the same bytes
+      const formData = new FormData();
+      formData.append('file', {
+        uri: photoUri,
+        type: 'image/jpeg',
+        name: 'photo.jpg',
+      } as any);
+      
+      const response = await fetch(`${LLM_API_URL}/upload-and-detect`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ image: base64 }),
+        body: formData,
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
       });
 
       console.log('📡 Response status:', response.status);
@@ -163,7 +233,7 @@ export class GameAPI {
       }
 
       const result = await response.json();
-      console.log('✅ API Success:', result.debug?.source, result.labels?.length, 'objects');
+      console.log('✅ API Success:', result.debug?.source, result.labels?.length, 'objects', result.timings);
       return result;
     } catch (error) {
       console.error('💥 Object detection error:', error);
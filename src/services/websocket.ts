@@ -1,8 +1,12 @@
+import { Turn } from '../types/game';
+
 interface WebSocketMessage {
   type: string;
   message?: string;
   turn_number?: number;
   player_name?: string;
+  turn?: Turn; // Full turn on turn_submitted, so clients can apply it without refetching
+  event_id?: string; // Sent back on reconnect to receive only the events missed meanwhile
 }
 
 export class WebSocketService {
@@ -13,6 +17,7 @@ export class WebSocketService {
   private reconnectAttempts = 0;
   private maxReconnectAttempts = 5;
   private reconnectDelay = 1000;
+  private lastEventId: string | null = null;
 
   private constructor(gameId: string) {
     this.gameId = gameId;
@@ -26,14 +31,15 @@ export class WebSocketService {
   }
 
   connect(apiBaseUrl: string): void {
-    if (this.ws?.readyState === WebSocket.OPEN) {
-      return; // Already connected
+    if (this.ws?.readyState === WebSocket.OPEN || this.ws?.readyState === WebSocket.CONNECTING) {
+      return; // Already connected or connecting
     }
 
     const wsUrl = apiBaseUrl.replace('https://', 'wss://').replace('http://', 'ws://');
     
     try {
-      this.ws = new WebSocket(`${wsUrl}/ws/${this.gameId}`);
+      const resume = this.lastEventId ? `?last_event_id=${encodeURIComponent(this.lastEventId)}` : '';
+      this.ws = new WebSocket(`${wsUrl}/ws/${this.gameId}${resume}`);
 
       this.ws.onopen = () => {
         console.log(`WebSocket connected for game ${this.gameId}`);
@@ -43,6 +49,15 @@ export class WebSocketService {
       this.ws.onmessage = (event) => {
         try {
           const message: WebSocketMessage = JSON.parse(event.data);
+          if (message.type === 'ping') {
+            // Answer the server heartbeat so this connection isn't reaped as idle
+            this.ws?.send(JSON.stringify({ type: 'pong' }));
+            return;
+          }
+          if (message.event_id) {
+            this.lastEventId = message.event_id;
+          }
+          // A "reset" means the missed events are gone; listeners reload the game
           this.notifyListeners(message);
         } catch (error) {
           console.error('Error parsing WebSocket message:', error);
@@ -100,6 +115,7 @@ export class WebSocketService {
       this.ws = null;
     }
     this.listeners = [];
+    this.lastEventId = null;
   }
 
   static cleanup(gameId: string): void {
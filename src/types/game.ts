@@ -6,6 +6,7 @@ export interface Game {
   createdAt: Date;
   updatedAt: Date;
   turns?: Turn[];
+  turnCount?: number; // Set instead of turns by summary batch fetches
 }
 
 export interface Turn {
@@ -13,6 +14,7 @@ export interface Turn {
   gameId: string;
   playerName: string;
   photoUrl: string;
+  photoVariants?: { thumb: string; medium: string } | null; // Resized copies served by the backend
   tags: string[];        // 3 tags total
   sharedTag: string;     // The tag shared from previous turn
   detectedTags: string[]; // All tags detected by AI
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Time GET /games/{game_id} against turns tables of different sizes.
+
+Seeds a throwaway SQLite database per size and calls the get_game handler
+for random games, once with the turns indexes and once without them.
+
+    python bench_get_game.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+TURNS_PER_GAME = 20
+BATCH = 10000
+
+
+def seed(main, total_turns: int):
+    games = total_turns // TURNS_PER_GAME
+    start = datetime(2025, 1, 1)
+    with main.engine.begin() as db:
+        db.execute(main.DBGame.__table__.insert(), [
+            {
+                "id": f"game-{g}",
+                "player1_name": "alice",
+                "player2_name": "bob",
+                "status": "IN_PROGRESS",
+                "created_at": start + timedelta(minutes=g),
+                "updated_at": start + timedelta(minutes=g),
+            }
+            for g in range(games)
+        ])
+        rows = []
+        for g in range(games):
+            for n in range(1, TURNS_PER_GAME + 1):
+                rows.append({
+                    "id": str(uuid.uuid4()),
+                    "game_id": f"game-{g}",
+                    "player_name": "alice" if n % 2 else "bob",
+                    "photo_url": f"https://example.com/photos/{g}-{n}.jpg",
+                    "tags": ["chair", "lamp", "table"],
+                    "shared_tag": "chair",
+                    "detected_tags": ["chair", "lamp", "table", "window", "door", "plant"],
+                    "turn_number": n,
+                    "created_at": start + timedelta(minutes=g, seconds=n),
+                })
+                if len(rows) >= BATCH:
+                    db.execute(main.DBTurn.__table__.insert(), rows)
+                    rows = []
+        if rows:
+            db.execute(main.DBTurn.__table__.insert(), rows)
+    return games
+
+
+async def measure_async(main, games: int, samples: int):
+    timings = []
+    async with main.SessionLocal() as db:
+        for _ in range(samples):
+            game_id = f"game-{random.randrange(games)}"
+            started = time.perf_counter()
+            response = await main.load_game(db, game_id)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert len(response["turns"]) == TURNS_PER_GAME
+            db.expunge_all()  # measure the query, not the identity map
+    await main.async_engine.dispose()
+    return timings
+
+
+def measure(main, games: int, samples: int):
+    timings = sorted(asyncio.run(measure_async(main, games, samples)))
+    return statistics.median(timings), timings[int(0.99 * (len(timings) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="twovue-bench-")
+    os.chdir(workdir)  # keep main's photos/ directory out of the repo
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    import main as app_main
+
+    from sqlalchemy import text
+    from schema_migrations import IDEMPOTENCY_INDEX, TURN_NUMBER_INDEX
+
+    print(f"📊 get_game latency, {TURNS_PER_GAME} turns per game")
+    for size in args.sizes:
+        with app_main.engine.begin() as conn:
+            conn.execute(text("DELETE FROM turns"))
+            conn.execute(text("DELETE FROM games"))
+        started = time.perf_counter()
+        games = seed(app_main, size)
+        print(f"  seeded {size} turns in {time.perf_counter() - started:.1f}s")
+
+        p50, p99 = measure(app_main, games, args.samples)
+        print(f"  {size:>8} turns  indexed    p50={p50:8.2f}ms p99={p99:8.2f}ms")
+
+        # Every turns index leads with game_id, so all of them have to go for a
+        # real full-scan baseline; upgrade_schema recreates them afterwards
+        with app_main.engine.begin() as conn:
+            conn.execute(text(f"DROP INDEX {TURN_NUMBER_INDEX}"))
+            conn.execute(text(f"DROP INDEX {IDEMPOTENCY_INDEX}"))
+            plan = conn.execute(text("EXPLAIN QUERY PLAN SELECT * FROM turns WHERE game_id = 'game-0'")).fetchall()
+            assert all("INDEX" not in row[-1] for row in plan), plan
+        p50, p99 = measure(app_main, games, max(10, args.samples // 10))
+        print(f"  {size:>8} turns  unindexed  p50={p50:8.2f}ms p99={p99:8.2f}ms")
+
+        app_main.upgrade_schema(app_main.engine)
+
+
+if __name__ == "__main__":
+    main()
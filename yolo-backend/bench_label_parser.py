@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Check and time label_parser against a corpus of model replies.
+
+Each corpus entry is a reply in one of the shapes GPT-4o has produced
+(structured JSON, plain comma list, bullets, numbered lines, prose with a
+preamble) with the labels it must parse to. Every entry is checked first,
+and any mismatch is printed and makes the script exit 1. Then the corpus is
+parsed repeatedly with the old per-phrase parser and with extract_labels,
+and the per-reply times are printed.
+
+    python bench_label_parser.py --rounds 2000
+"""
+
+import argparse
+import re
+import sys
+import time
+
+from label_parser import canonical_label, extract_labels
+
+CORPUS = [
+    (
+        '{"objects": ["chair", "table", "laptop", "coffee mug", "lamp"]}',
+        ["chair", "table", "laptop", "mug", "lamp"],
+    ),
+    (
+        '{"objects": ["Sofas", "TV", "remote", "throw pillows", "bookcase", "potted plant"]}',
+        ["couch", "television", "remote control", "pillow", "bookshelf", "plant"],
+    ),
+    (
+        '{"objects": []}',
+        [],
+    ),
+    (
+        "chair, table, lamp, window, door, picture frame, keyboard, mouse",
+        ["chair", "table", "lamp", "window", "door", "picture frame", "keyboard", "mouse"],
+    ),
+    (
+        "Sure! Here are the objects I can see: chairs, a wooden table, lamps, books, and a potted plant.",
+        ["chair", "wooden table", "lamp", "book", "plant"],
+    ),
+    (
+        "Here's a list of objects in the image:\n- Laptop\n- Coffee mug\n- Headphones\n- Notebook\n- Pens",
+        ["laptop", "mug", "headphones", "notebook", "pen"],
+    ),
+    (
+        "1. Couch\n2. Television (mounted on the wall)\n3. Rug\n4. Bookshelves\n5. Glasses\n6. Boxes",
+        ["couch", "television", "carpet", "bookshelf", "glasses", "box"],
+    ),
+    (
+        "**Furniture:** desk, office chair\n**Electronics:** monitor, keyboard, cell phone\n**Other:** scissors, batteries, knives",
+        ["desk", "office chair", "monitor", "keyboard", "phone", "scissors", "battery", "knife"],
+    ),
+    (
+        "The image shows a kitchen. Objects include: refrigerator, microwave, dishes, glasses, "
+        "wine glasses, benches, potatoes, etc.",
+        ["refrigerator", "microwave", "dish", "glasses", "wine glasses", "bench", "potato"],
+    ),
+    (
+        "Detected objects; bottle; cup; backpack; umbrella; trash bin; cactus",
+        ["bottle", "cup", "backpack", "umbrella", "trash can", "cactus"],
+    ),
+    (
+        "I can see a bicycle, a helmet and two water bottles.",
+        ["bicycle", "helmet", "water bottle"],
+    ),
+    (
+        "chair, Chair, chairs, CHAIR., sofa, couch",
+        ["chair", "couch"],
+    ),
+    (
+        "olives, cookies, brownies, pies, movies, bookshelves, batteries",
+        ["olive", "cookie", "brownie", "pie", "movie", "bookshelf", "battery"],
+    ),
+    (
+        "chairs and a table, lamps & candles, I like the sofa",
+        ["chair", "table", "lamp", "candle", "couch"],
+    ),
+]
+
+
+UNWANTED_PHRASES = [
+    "sure", "here's", "here are", "i can see", "i see", "the image shows",
+    "in the image", "from the image", "i can identify", "objects include",
+    "here's a list", "here are the", "list of objects", "detected objects"
+]
+
+
+def legacy_extract(raw_content: str):
+    """The parser detect_with_openai used before label_parser, for comparison"""
+    content_lower = raw_content.lower()
+    if ":" in raw_content and any(indicator in content_lower for indicator in ["objects", "items", "list"]):
+        list_part = raw_content.split(":", 1)[1]
+    else:
+        list_part = raw_content
+    if "," in list_part:
+        objects = [obj.strip() for obj in list_part.split(",")]
+    elif "\n" in list_part:
+        objects = [obj.strip() for obj in list_part.split("\n")]
+    else:
+        objects = [obj.strip() for obj in list_part.split()]
+    cleaned_objects = []
+    for obj in objects:
+        obj = re.sub(r'^[\d\.\-\*\•\s]+', '', obj)
+        for phrase in UNWANTED_PHRASES:
+            if phrase in obj.lower():
+                obj = re.sub(re.escape(phrase), '', obj, flags=re.IGNORECASE)
+        obj = obj.strip().strip('.,!?;:"()[]{}').lower()
+        if (len(obj) > 2 and
+            obj not in ['the', 'and', 'or', 'a', 'an', 'is', 'are', 'it', 'this', 'that'] and
+            not obj.startswith('http') and
+            not any(phrase in obj for phrase in UNWANTED_PHRASES)):
+            cleaned_objects.append(obj)
+    return list(dict.fromkeys(cleaned_objects))[:30]
+
+
+def check() -> int:
+    failures = 0
+    for reply, expected in CORPUS:
+        labels, _, _ = extract_labels(reply)
+        if labels != expected:
+            failures += 1
+            print(f"❌ {reply[:60]!r}\n   expected {expected}\n   got      {labels}")
+    # Canonicalization must be idempotent or stored labels drift on re-parse
+    for _, expected in CORPUS:
+        for label in expected:
+            if canonical_label(label) != label:
+                failures += 1
+                print(f"❌ canonical_label({label!r}) -> {canonical_label(label)!r}")
+    return failures
+
+
+def exact_matches(parse) -> int:
+    return sum(1 for reply, expected in CORPUS if parse(reply) == expected)
+
+
+def time_parser(parse, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for reply, _ in CORPUS:
+            parse(reply)
+    return (time.perf_counter() - start) / (rounds * len(CORPUS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    failures = check()
+    print(f"❌ {failures} mismatches" if failures else f"✅ all {len(CORPUS)} corpus replies parsed as expected")
+
+    new = lambda reply: extract_labels(reply)[0]
+    print(f"{'parser':<13} {'exact':>7} {'µs/reply':>10}")
+    for name, parse in (("legacy", legacy_extract), ("label_parser", new)):
+        print(f"{name:<13} {exact_matches(parse):>4}/{len(CORPUS):<2} {time_parser(parse, args.rounds):>10.1f}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Compare per-request httpx clients with the shared pooled client.
+
+Starts a local stub of the chat completions endpoint and fires the same
+requests through both strategies, printing p50/p99 latency.
+
+    python bench_openai_client.py --requests 500 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from http_client import create_openai_client
+
+STUB_RESPONSE = b'{"choices": [{"message": {"content": "chair, table, lamp"}}]}'
+
+
+async def stub_app(scope, receive, send):
+    """Minimal ASGI stand-in for POST /v1/chat/completions"""
+    if scope["type"] != "http":
+        return
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": STUB_RESPONSE})
+
+
+def start_stub(port: int) -> uvicorn.Server:
+    config = uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(strategy, base_url: str, total: int, concurrency: int):
+    payload = {"model": "gpt-4o", "messages": [{"role": "user", "content": "x" * 2048}]}
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    shared = create_openai_client(base_url) if strategy == "pooled" else None
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            if shared is not None:
+                response = await shared.post("/chat/completions", json=payload)
+            else:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(f"{base_url}/chat/completions", json=payload, timeout=30.0)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    try:
+        await asyncio.gather(*(one() for _ in range(total)))
+    finally:
+        if shared is not None:
+            await shared.aclose()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = start_stub(args.port)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+
+    print(f"📊 {args.requests} requests, concurrency {args.concurrency}")
+    for strategy in ("per-request", "pooled"):
+        latencies = asyncio.run(run(strategy, base_url, args.requests, args.concurrency))
+        print(
+            f"  {strategy:12s} p50={percentile(latencies, 50):7.2f}ms "
+            f"p99={percentile(latencies, 99):7.2f}ms mean={statistics.mean(latencies):7.2f}ms"
+        )
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,529 @@
+"""Fan-out of game events to WebSockets held by every worker and replica.
+
+ConnectionManager only knows the sockets connected to its own process. Each
+broadcast is sent to those sockets directly and also published on a
+backplane. Every process subscribes to the games it has sockets for and
+relays what other processes publish to its own sockets, so a turn submitted
+through one worker reaches players connected to another.
+
+Locally, a broadcast is serialized once and queued on each socket's bounded
+outbound queue, with a writer task per socket doing the sends under a
+timeout. Sockets that fall behind are dropped, and a heartbeat pings every
+socket and reaps those that stop answering.
+
+Backplanes (BROADCAST_BACKPLANE):
+  * local    - in-process hub; the default for a single worker, and a stand-in
+               for tests (several managers sharing one LocalHub act like workers)
+  * redis    - Redis pub/sub, one channel per game
+  * postgres - LISTEN/NOTIFY on the app database, one channel per game
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from event_log import GameEventLog
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional - only needed for BROADCAST_BACKPLANE=redis
+    aioredis = None
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+# Called with (game_id, message) for events published by other processes
+Deliver = Callable[[str, dict], Awaitable[None]]
+
+
+class LocalHub:
+    """Subscriptions shared by every LocalBackplane in this process"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["LocalBackplane"]] = {}
+
+
+class LocalBackplane:
+    def __init__(self, hub: Optional[LocalHub] = None):
+        self.hub = hub or LocalHub()
+        self._deliver: Optional[Deliver] = None
+        self.stats: Dict[str, int] = {"published": 0, "received": 0, "errors": 0}
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def subscribe(self, game_id: str):
+        self.hub.subscribers.setdefault(game_id, set()).add(self)
+
+    async def unsubscribe(self, game_id: str):
+        subscribers = self.hub.subscribers.get(game_id)
+        if subscribers:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.hub.subscribers[game_id]
+
+    async def publish(self, game_id: str, envelope: dict):
+        self.stats["published"] += 1
+        for subscriber in list(self.hub.subscribers.get(game_id, ())):
+            if subscriber is not self and subscriber._deliver:
+                subscriber.stats["received"] += 1
+                await subscriber._deliver(game_id, envelope)
+
+    def snapshot(self) -> dict:
+        return {"backend": "local", **self.stats}
+
+    async def aclose(self):
+        for game_id in [g for g, subs in self.hub.subscribers.items() if self in subs]:
+            await self.unsubscribe(game_id)
+
+
+class RedisBackplane:
+    def __init__(self, url: str, prefix: str = "twovue:", client=None):
+        if aioredis is None and client is None:
+            raise RuntimeError("BROADCAST_BACKPLANE=redis needs the redis package (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self._redis = client or aioredis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._subscribed = asyncio.Event()
+        self._reader: Optional[asyncio.Task] = None
+        self._deliver: Optional[Deliver] = None
+        self.stats: Dict[str, int] = {"published": 0, "received": 0, "errors": 0}
+
+    def _channel(self, game_id: str) -> str:
+        return f"{self.prefix}game-events:{game_id}"
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            # get_message needs at least one subscription to have a connection
+            await self._subscribed.wait()
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"⚠️  Broadcast subscriber error: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            await self._received(message["data"])
+
+    async def _received(self, data):
+        try:
+            envelope = json.loads(data)
+            self.stats["received"] += 1
+            await self._deliver(envelope["game_id"], envelope)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️  Dropped broadcast event: {e}")
+
+    async def subscribe(self, game_id: str):
+        try:
+            await self._pubsub.subscribe(self._channel(game_id))
+            self._subscribed.set()
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Broadcast subscribe failed for {game_id}: {e}")
+
+    async def unsubscribe(self, game_id: str):
+        try:
+            await self._pubsub.unsubscribe(self._channel(game_id))
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️  Broadcast unsubscribe failed for {game_id}: {e}")
+
+    async def publish(self, game_id: str, envelope: dict):
+        try:
+            await self._redis.publish(self._channel(game_id), json.dumps(envelope))
+            self.stats["published"] += 1
+        except Exception as e:
+            # Local sockets already have the event; only other workers miss it
+            self.stats["errors"] += 1
+            print(f"❌ Broadcast publish failed for {game_id}: {e}")
+
+    def snapshot(self) -> dict:
+        return {"backend": "redis", **self.stats, "channels": len(self._pubsub.channels)}
+
+    async def aclose(self):
+        if self._reader:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+
+class PostgresBackplane:
+    """LISTEN/NOTIFY over one dedicated asyncpg connection per process.
+
+    asyncpg runs one operation at a time per connection, so every listen,
+    unlisten and notify goes through _lock.
+    """
+
+    def __init__(self, dsn: str, prefix: str = "twovue_"):
+        if asyncpg is None:
+            raise RuntimeError("BROADCAST_BACKPLANE=postgres needs asyncpg (pip install asyncpg)")
+        self.dsn = dsn
+        self.prefix = prefix
+        self._conn = None
+        # Held for every operation on _conn, not just (re)connecting
+        self._lock = asyncio.Lock()
+        self._games: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._deliver: Optional[Deliver] = None
+        self.stats: Dict[str, int] = {"published": 0, "received": 0, "errors": 0, "reconnects": 0}
+
+    def _channel(self, game_id: str) -> str:
+        # Channel names are identifiers (63 bytes max), so hash the game id
+        return self.prefix + hashlib.sha1(game_id.encode()).hexdigest()[:32]
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def _connection(self):
+        """The listening connection, reconnected and re-subscribed if it dropped. Call with _lock held"""
+        if self._conn is None or self._conn.is_closed():
+            if self._conn is not None:
+                self.stats["reconnects"] += 1
+            self._conn = await asyncpg.connect(self.dsn)
+            for game_id in self._games:
+                await self._conn.add_listener(self._channel(game_id), self._notified)
+        return self._conn
+
+    def _notified(self, connection, pid, channel, payload):
+        task = asyncio.create_task(self._received(payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _received(self, payload: str):
+        try:
+            envelope = json.loads(payload)
+            self.stats["received"] += 1
+            await self._deliver(envelope["game_id"], envelope)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️  Dropped broadcast event: {e}")
+
+    async def subscribe(self, game_id: str):
+        try:
+            async with self._lock:
+                self._games.add(game_id)
+                conn = await self._connection()
+                await conn.add_listener(self._channel(game_id), self._notified)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Broadcast subscribe failed for {game_id}: {e}")
+
+    async def unsubscribe(self, game_id: str):
+        try:
+            async with self._lock:
+                self._games.discard(game_id)
+                if self._conn is not None and not self._conn.is_closed():
+                    await self._conn.remove_listener(self._channel(game_id), self._notified)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️  Broadcast unsubscribe failed for {game_id}: {e}")
+
+    async def publish(self, game_id: str, envelope: dict):
+        try:
+            async with self._lock:
+                conn = await self._connection()
+                # NOTIFY payloads are limited to 8000 bytes; turn events are well under
+                await conn.execute("SELECT pg_notify($1, $2)", self._channel(game_id), json.dumps(envelope))
+            self.stats["published"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Broadcast publish failed for {game_id}: {e}")
+
+    def snapshot(self) -> dict:
+        return {"backend": "postgres", **self.stats, "channels": len(self._games)}
+
+    async def aclose(self):
+        async with self._lock:
+            if self._conn is not None:
+                await self._conn.close()
+                self._conn = None
+
+
+class RateMeter:
+    """Events per second over the last `window` seconds"""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._buckets: Deque[List[int]] = deque()  # [second, count]
+
+    def _trim(self, now: int):
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+    def add(self, count: int = 1):
+        now = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == now:
+            self._buckets[-1][1] += count
+        else:
+            self._buckets.append([now, count])
+        self._trim(now)
+
+    def rate(self) -> float:
+        self._trim(int(time.monotonic()))
+        return sum(count for _, count in self._buckets) / self.window
+
+
+class ClientConnection:
+    """One socket with its own bounded outbound queue and writer task.
+
+    Broadcasts only enqueue, so a slow phone never holds up the others. A full
+    queue or a send that outlasts send_timeout drops the connection; the app
+    reconnects and catches up with GET /games/{id}/turns.
+    """
+
+    def __init__(self, websocket, game_id: str, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.game_id = game_id
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=manager.queue_size)
+        self.last_seen = time.monotonic()
+        # Set once the client sends anything (e.g. a pong); only those can be idle-reaped
+        self.answers_pings = False
+        self.closed = False
+        self._writer = asyncio.create_task(self._write())
+
+    def offer(self, text: str) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self.manager.drop(self, "dropped_slow")
+            return False
+
+    async def _write(self):
+        while True:
+            text = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(text), self.manager.send_timeout)
+            except asyncio.TimeoutError:
+                self.manager.drop(self, "send_timeouts")
+                return
+            except Exception:
+                self.manager.drop(self, "dead")
+                return
+            self.manager.stats["sent"] += 1
+            self.manager.send_rate.add()
+
+    def seen(self):
+        self.last_seen = time.monotonic()
+        self.answers_pings = True
+
+    async def close(self, code: int):
+        self.closed = True
+        self._writer.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), self.manager.send_timeout)
+        except Exception:
+            pass  # already gone
+
+
+# Close codes: 1013 "try again later" for slow consumers, 1001 "going away" when idle
+CLOSE_CODES = {"dropped_slow": 1013, "send_timeouts": 1013, "dead": 1011, "reaped": 1001}
+PING_MESSAGE = json.dumps({"type": "ping"})
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        backplane=None,
+        queue_size: int = 64,
+        send_timeout: float = 10.0,
+        ping_interval: float = 25.0,
+        idle_timeout: float = 60.0,
+        events: Optional[GameEventLog] = None,
+    ):
+        self.active_connections: Dict[str, Dict[object, ClientConnection]] = {}
+        self.backplane = backplane or LocalBackplane()
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.events = events or GameEventLog()
+        # Sockets plus SSE/long-poll waiters per game; subscribed while above zero
+        self._interest: Dict[str, int] = {}
+        # Tags this process's events so it doesn't relay its own broadcasts twice
+        self.origin = uuid.uuid4().hex
+        self.stats: Dict[str, int] = {
+            "broadcasts": 0, "relayed": 0, "sent": 0, "pings": 0,
+            "dropped_slow": 0, "send_timeouts": 0, "dead": 0, "reaped": 0,
+        }
+        self.broadcast_rate = RateMeter()
+        self.send_rate = RateMeter()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._closing: Set[asyncio.Task] = set()
+
+    async def start(self):
+        await self.backplane.start(self._relay)
+        if self.ping_interval > 0:
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def _retain(self, game_id: str):
+        self._interest[game_id] = self._interest.get(game_id, 0) + 1
+        if self._interest[game_id] == 1:
+            await self.backplane.subscribe(game_id)
+
+    async def _release(self, game_id: str):
+        self._interest[game_id] -= 1
+        if not self._interest[game_id]:
+            del self._interest[game_id]
+            await self.backplane.unsubscribe(game_id)
+
+    @asynccontextmanager
+    async def watching(self, game_id: str):
+        """Keep this game's events coming from other workers, for SSE and long-poll"""
+        await self._retain(game_id)
+        try:
+            yield
+        finally:
+            await self._release(game_id)
+
+    async def connect(self, websocket, game_id: str, last_event_id: Optional[str] = None):
+        await websocket.accept()
+        await self._retain(game_id)
+        connection = ClientConnection(websocket, game_id, self)
+        self.active_connections.setdefault(game_id, {})[websocket] = connection
+        # Replay before the next await, so live events queue up behind the missed ones
+        if last_event_id:
+            missed, reset = self.events.since(game_id, last_event_id)
+            if reset or len(missed) >= self.queue_size:
+                connection.offer(json.dumps({"type": "reset", "event_id": self.events.head()}))
+            else:
+                for event in missed:
+                    connection.offer(json.dumps(event))
+        print(f"WebSocket connected to game {game_id}. Total connections: {len(self.active_connections[game_id])}")
+
+    def seen(self, websocket, game_id: str):
+        connection = self.active_connections.get(game_id, {}).get(websocket)
+        if connection:
+            connection.seen()
+
+    async def disconnect(self, websocket, game_id: str):
+        connections = self.active_connections.get(game_id)
+        connection = connections.pop(websocket, None) if connections else None
+        if connection is None:
+            return
+        connection.closed = True
+        connection._writer.cancel()
+        if not connections:
+            del self.active_connections[game_id]
+        await self._release(game_id)
+
+    def drop(self, connection: ClientConnection, reason: str):
+        """Close a connection that fell behind or stopped answering, in the background"""
+        if connection.closed:
+            return
+        connection.closed = True
+        self.stats[reason] += 1
+        print(f"⚠️  Closing WebSocket for game {connection.game_id}: {reason}")
+        task = asyncio.create_task(self._close(connection, CLOSE_CODES[reason]))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, connection: ClientConnection, code: int):
+        await connection.close(code)
+        await self.disconnect(connection.websocket, connection.game_id)
+
+    async def broadcast_to_game(self, game_id: str, message: dict):
+        """Send to this process's sockets, then publish for the other processes"""
+        self.stats["broadcasts"] += 1
+        self.broadcast_rate.add()
+        self.send_local(game_id, message)
+        await self.backplane.publish(game_id, {"origin": self.origin, "game_id": game_id, "message": message})
+
+    async def _relay(self, game_id: str, envelope: dict):
+        if envelope.get("origin") == self.origin:
+            return
+        self.stats["relayed"] += 1
+        self.send_local(game_id, envelope["message"])
+
+    def send_local(self, game_id: str, message: dict):
+        """Record the event, then serialize once and queue it for every socket on this game"""
+        event = self.events.append(game_id, message)
+        connections = self.active_connections.get(game_id)
+        if not connections:
+            return
+        text = json.dumps(event)
+        for connection in list(connections.values()):
+            connection.offer(text)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            now = time.monotonic()
+            for connections in list(self.active_connections.values()):
+                for connection in list(connections.values()):
+                    # Clients that never answered are older apps; the send timeout covers those
+                    if connection.answers_pings and now - connection.last_seen > self.idle_timeout:
+                        self.drop(connection, "reaped")
+                    elif connection.offer(PING_MESSAGE):
+                        self.stats["pings"] += 1
+
+    def snapshot(self) -> dict:
+        connections = [c for conns in self.active_connections.values() for c in conns.values()]
+        return {
+            **self.stats,
+            "games": len(self.active_connections),
+            "connections": len(connections),
+            "queued_messages": sum(c.queue.qsize() for c in connections),
+            "max_queue_depth": max((c.queue.qsize() for c in connections), default=0),
+            "broadcasts_per_second": round(self.broadcast_rate.rate(), 3),
+            "messages_per_second": round(self.send_rate.rate(), 3),
+            "queue_size": self.queue_size,
+            "send_timeout": self.send_timeout,
+            "ping_interval": self.ping_interval,
+            "idle_timeout": self.idle_timeout,
+            "backplane": self.backplane.snapshot(),
+            "event_log": self.events.snapshot(),
+        }
+
+    async def aclose(self):
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        for connections in self.active_connections.values():
+            for connection in connections.values():
+                connection._writer.cancel()
+        await self.backplane.aclose()
+
+
+def backplane_from_env(database_url: str):
+    """BROADCAST_BACKPLANE=local (default), redis or postgres"""
+    backend = os.getenv("BROADCAST_BACKPLANE", "local").lower()
+    try:
+        if backend == "redis":
+            url = os.getenv("BROADCAST_REDIS_URL") or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+            backplane = RedisBackplane(url, prefix=os.getenv("BROADCAST_PREFIX", "twovue:"))
+            print(f"📡 Broadcast backplane: redis ({url.split('@')[-1]})")
+            return backplane
+        if backend == "postgres":
+            if not database_url.startswith("postgresql"):
+                raise RuntimeError("BROADCAST_BACKPLANE=postgres needs a PostgreSQL DATABASE_URL")
+            # asyncpg takes a plain libpq-style DSN without a +driver suffix
+            dsn = "postgresql://" + database_url.split("://", 1)[1]
+            backplane = PostgresBackplane(dsn, prefix=os.getenv("BROADCAST_PREFIX", "twovue_"))
+            print("📡 Broadcast backplane: postgres LISTEN/NOTIFY")
+            return backplane
+    except RuntimeError as e:
+        print(f"⚠️  {e} - falling back to in-process broadcasts (single worker only)")
+    print("📡 Broadcast backplane: local (single worker)")
+    return LocalBackplane()
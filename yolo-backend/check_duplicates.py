@@ -1,84 +1,153 @@
 #!/usr/bin/env python3
+"""Find and remove duplicate turn submissions with set-based SQL.
 
+A duplicate is a turn with the same game, player and photo as an earlier
+turn. One window query (ROW_NUMBER over game/player/photo) ranks the copies.
+The original is the earliest, and everything after it is removed by a
+single DELETE per batch of games. The /debug/duplicates endpoints use the
+same functions.
+
+    python check_duplicates.py                       # report every game
+    python check_duplicates.py --game-id quantum-pattern-ultra
+    python check_duplicates.py --delete              # remove, in batches of games
+"""
+
+import argparse
+import asyncio
+import contextlib
 import os
-import sqlite3
-import json
-from datetime import datetime
-
-# Check if we have a local SQLite database
-if os.path.exists('twovue.db'):
-    print("📊 Found local SQLite database")
-    conn = sqlite3.connect('twovue.db')
-    cursor = conn.cursor()
-    
-    # Find games with quantum-pattern-ultra in the name
-    cursor.execute("SELECT * FROM games WHERE id LIKE '%quantum-pattern-ultra%'")
-    games = cursor.fetchall()
-    
-    print(f"🎮 Found {len(games)} games matching 'quantum-pattern-ultra'")
-    
-    for game in games:
-        game_id = game[0]
-        player1 = game[1]
-        player2 = game[2]
-        status = game[3]
-        
-        print(f"\n🆔 Game ID: {game_id}")
-        print(f"👤 Player 1: {player1}")
-        print(f"👤 Player 2: {player2}")
-        print(f"📊 Status: {status}")
-        
-        # Get all turns for this game
-        cursor.execute("SELECT * FROM turns WHERE game_id = ? ORDER BY created_at", (game_id,))
-        turns = cursor.fetchall()
-        
-        print(f"🔄 Total turns in database: {len(turns)}")
-        
-        # Check for duplicates
-        photo_urls = {}
-        duplicates = []
-        
-        for i, turn in enumerate(turns):
-            turn_id = turn[0]
-            player_name = turn[2]
-            photo_url = turn[3]
-            turn_number = turn[6]
-            created_at = turn[7]
-            
-            print(f"  Turn {i+1}: Player={player_name}, Turn#={turn_number}, Time={created_at}")
-            print(f"    Photo: {photo_url}")
-            
-            # Track photo URLs to find duplicates
-            if photo_url in photo_urls:
-                duplicates.append({
-                    'original': photo_urls[photo_url],
-                    'duplicate': {
-                        'turn_id': turn_id,
-                        'player': player_name,
-                        'turn_number': turn_number,
-                        'created_at': created_at
-                    }
-                })
-                print(f"    ⚠️ DUPLICATE PHOTO DETECTED!")
+import sys
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import delete, func, select, true
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from database import create_async_db_engine, games, turns
+
+DUPLICATE_BATCH_GAMES = int(os.getenv("DUPLICATE_BATCH_GAMES", "500"))
+
+# One game id, an inclusive (first, last) range of game ids, or None for all games
+GameFilter = Optional[Union[str, Tuple[str, str]]]
+
+
+def _where_games(column, game_filter: GameFilter):
+    if game_filter is None:
+        return true()
+    if isinstance(game_filter, tuple):
+        return column.between(*game_filter)
+    return column == game_filter
+
+
+def ranked_turns(game_filter: GameFilter = None):
+    """Turns numbered 1, 2, ... within each (game, player, photo), earliest first"""
+    window = {
+        "partition_by": (turns.c.game_id, turns.c.player_name, turns.c.photo_url),
+        "order_by": (turns.c.created_at, turns.c.turn_number, turns.c.id),
+    }
+    return select(
+        turns.c.id,
+        turns.c.game_id,
+        turns.c.player_name,
+        turns.c.photo_url,
+        turns.c.turn_number,
+        turns.c.created_at,
+        func.row_number().over(**window).label("copy"),
+        func.first_value(turns.c.id).over(**window).label("original_id"),
+    ).where(_where_games(turns.c.game_id, game_filter)).subquery("ranked")
+
+
+async def find_duplicates(conn: AsyncConnection, game_filter: GameFilter = None) -> List[dict]:
+    ranked = ranked_turns(game_filter)
+    result = await conn.execute(
+        select(ranked).where(ranked.c.copy > 1).order_by(ranked.c.game_id, ranked.c.turn_number)
+    )
+    return [dict(row) for row in result.mappings()]
+
+
+async def remove_duplicates(conn: AsyncConnection, game_filter: GameFilter = None) -> List[Tuple[str, str]]:
+    """Delete every copy after the original in one statement. Returns (turn_id, game_id) pairs"""
+    ranked = ranked_turns(game_filter)
+    result = await conn.execute(
+        delete(turns)
+        .where(turns.c.id.in_(select(ranked.c.id).where(ranked.c.copy > 1)))
+        .returning(turns.c.id, turns.c.game_id)
+    )
+    return [(row[0], row[1]) for row in result]
+
+
+async def next_game_batch(conn: AsyncConnection, after: Optional[str], batch_games: int) -> Optional[Tuple[str, str]]:
+    """Inclusive (first, last) range covering the next batch_games game ids after `after`"""
+    query = select(games.c.id).order_by(games.c.id).limit(batch_games)
+    if after is not None:
+        query = query.where(games.c.id > after)
+    ids = (await conn.execute(query)).scalars().all()
+    return (ids[0], ids[-1]) if ids else None
+
+
+async def scan_all_games(engine: AsyncEngine, delete_duplicates: bool = False, batch_games: int = DUPLICATE_BATCH_GAMES) -> dict:
+    """Check (or clean) every game, one transaction per batch of games"""
+    found = 0
+    affected_games = set()
+    removed_ids: List[str] = []
+    after = None
+    while True:
+        async with engine.begin() as conn:
+            batch = await next_game_batch(conn, after, batch_games)
+            if batch is None:
+                break
+            if delete_duplicates:
+                removed = await remove_duplicates(conn, batch)
+                removed_ids.extend(turn_id for turn_id, _ in removed)
+                affected_games.update(game_id for _, game_id in removed)
+                found += len(removed)
             else:
-                photo_urls[photo_url] = {
-                    'turn_id': turn_id,
-                    'player': player_name,
-                    'turn_number': turn_number,
-                    'created_at': created_at
-                }
-        
-        if duplicates:
-            print(f"\n🚨 Found {len(duplicates)} duplicate submissions:")
-            for dup in duplicates:
-                print(f"  Original: {dup['original']['created_at']}")
-                print(f"  Duplicate: {dup['duplicate']['created_at']}")
-                print(f"  Same photo, same player: {dup['original']['player'] == dup['duplicate']['player']}")
+                duplicates = await find_duplicates(conn, batch)
+                affected_games.update(row["game_id"] for row in duplicates)
+                found += len(duplicates)
+        after = batch[1]
+    return {
+        "duplicates_found": found,
+        "duplicates_removed": found if delete_duplicates else 0,
+        "games_affected": sorted(affected_games),
+        "removed_turn_ids": removed_ids,
+    }
+
+
+async def run(args):
+    url = args.database_url
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    with contextlib.redirect_stdout(sys.stderr):
+        engine = create_async_db_engine(url)
+    try:
+        if args.game_id:
+            async with engine.begin() as conn:
+                duplicates = await find_duplicates(conn, args.game_id)
+                for row in duplicates:
+                    print(f"  ⚠️  {row['game_id']} turn {row['turn_number']} by {row['player_name']} duplicates {row['original_id']} ({row['photo_url']})")
+                if args.delete and duplicates:
+                    removed = await remove_duplicates(conn, args.game_id)
+                    print(f"🗑️  Removed {len(removed)} duplicate turns from {args.game_id}")
+                elif not duplicates:
+                    print(f"✅ No duplicate submissions in {args.game_id}")
         else:
-            print("✅ No duplicate photo submissions found")
-    
-    conn.close()
-    
-else:
-    print("❌ No local SQLite database found (twovue.db)")
-    print("💡 This script is designed for local development database checking") 
\ No newline at end of file
+            summary = await scan_all_games(engine, delete_duplicates=args.delete, batch_games=args.batch_games)
+            verb = "Removed" if args.delete else "Found"
+            print(f"{'🗑️ ' if args.delete else '🔍'} {verb} {summary['duplicates_found']} duplicate turns in {len(summary['games_affected'])} games")
+            for game_id in summary["games_affected"][:50]:
+                print(f"  - {game_id}")
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game-id", help="only check this game")
+    parser.add_argument("--delete", action="store_true", help="remove duplicates (without it nothing is changed)")
+    parser.add_argument("--batch-games", type=int, default=DUPLICATE_BATCH_GAMES, help="games per transaction")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./twovue.db"))
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Stream games and turns out of the database as NDJSON or CSV.
+
+Rows are read in keyset-paginated batches of --batch-size and written as
+they arrive, so memory stays flat however large the tables get. Each batch
+is one short query that gives its connection back to the pool before its
+rows are written out, so a slow download never pins a pooled connection.
+Used by GET /debug/export/{kind} and from the command line:
+
+    python data_export.py turns --format csv --since 2025-01-01 -o turns.csv
+    python data_export.py games --until 2025-06-01 > games.ndjson
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database import create_async_db_engine, games, turns
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Ordered by a unique key, which also serves as the keyset for paging. Turns end
+# with id because legacy databases can still have duplicate turn numbers
+EXPORT_TABLES = {
+    "games": (games, (games.c.created_at, games.c.id)),
+    "turns": (turns, (turns.c.game_id, turns.c.turn_number, turns.c.id)),
+}
+
+
+def _after_key(order_by, after: tuple):
+    """Rows ordered strictly after `after`: (a, b, c) > (x, y, z) spelled out for every dialect"""
+    conditions = []
+    for i, column in enumerate(order_by):
+        equal = [order_by[j] == after[j] for j in range(i)]
+        conditions.append(and_(*equal, column > after[i]))
+    return or_(*conditions)
+
+
+def export_query(kind: str, since: Optional[datetime] = None, until: Optional[datetime] = None, after: Optional[tuple] = None):
+    source, order_by = EXPORT_TABLES[kind]
+    query = select(source).order_by(*order_by)
+    if after is not None:
+        # Resume strictly after the last row of the previous batch
+        query = query.where(_after_key(order_by, after))
+    if since:
+        query = query.where(source.c.created_at >= since)
+    if until:
+        query = query.where(source.c.created_at < until)
+    return query
+
+
+async def export_rows(
+    engine: AsyncEngine,
+    kind: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[dict]:
+    """Yield rows one at a time, fetching batch_size of them per query"""
+    order_by = EXPORT_TABLES[kind][1]
+    after = None
+    while True:
+        async with engine.connect() as conn:
+            result = await conn.execute(export_query(kind, since, until, after).limit(batch_size))
+            rows = result.mappings().all()
+        # The connection is back in the pool while the caller writes these out
+        for row in rows:
+            yield dict(row)
+        if len(rows) < batch_size:
+            return
+        after = tuple(rows[-1][column.name] for column in order_by)
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def ndjson_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps({key: _plain(value) for key, value in row.items()}) + "\n"
+
+
+async def csv_lines(rows: AsyncIterator[dict], kind: str) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take() -> str:
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(EXPORT_TABLES[kind][0].c.keys())
+    yield take()
+    async for row in rows:
+        # Tag lists go into a single cell as JSON
+        writer.writerow([
+            json.dumps(value) if isinstance(value, (list, dict)) else _plain(value)
+            for value in row.values()
+        ])
+        yield take()
+
+
+def export_lines(
+    engine: AsyncEngine,
+    kind: str,
+    fmt: str = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[str]:
+    rows = export_rows(engine, kind, since, until, batch_size)
+    return csv_lines(rows, kind) if fmt == "csv" else ndjson_lines(rows)
+
+
+async def chunked(lines: AsyncIterator[str], chunk_bytes: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """Group lines into chunks so a response isn't one write per row"""
+    parts, size = [], 0
+    async for line in lines:
+        data = line.encode("utf-8")
+        parts.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+async def run(args) -> int:
+    url = args.database_url
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the export itself
+        engine = create_async_db_engine(url)
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    count = 0
+    try:
+        async for line in export_lines(engine, args.kind, args.format, args.since, args.until, args.batch_size):
+            output.write(line)
+            count += 1
+    finally:
+        if args.output:
+            output.close()
+        await engine.dispose()
+    return count - 1 if args.format == "csv" else count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only rows created at or after this time")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="only rows created before this time")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE, help="rows fetched per round trip")
+    parser.add_argument("-o", "--output", help="file to write (default stdout)")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./twovue.db"))
+    args = parser.parse_args()
+
+    count = asyncio.run(run(args))
+    print(f"📦 Exported {count} {args.kind}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Async SQLAlchemy engine used by the request handlers.
+
+Handlers run on uvicorn's event loop, so they talk to the database through
+an AsyncEngine (asyncpg on Postgres, aiosqlite on SQLite) instead of blocking
+the loop on a synchronous Session. The synchronous engine in main.py is only
+used at startup for create_all and schema_migrations.
+
+The CLI tools (data_export, check_duplicates) also build their engine here.
+"""
+
+import os
+
+from sqlalchemy import JSON, DateTime, Integer, String, column, event, table
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Lightweight table definitions for scripts that don't import the app's models
+games = table(
+    "games",
+    column("id", String),
+    column("player1_name", String),
+    column("player2_name", String),
+    column("status", String),
+    column("created_at", DateTime),
+    column("updated_at", DateTime),
+    column("last_turn_number", Integer),
+)
+turns = table(
+    "turns",
+    column("id", String),
+    column("game_id", String),
+    column("player_name", String),
+    column("photo_url", String),
+    column("tags", JSON),
+    column("shared_tag", String),
+    column("detected_tags", JSON),
+    column("turn_number", Integer),
+    column("idempotency_key", String),
+    column("created_at", DateTime),
+)
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Swap the sync driver in a DATABASE_URL for its async counterpart"""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    if backend == "postgres":
+        backend = "postgresql"
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {scheme}://")
+    if backend == "postgresql":
+        # libpq's sslmode isn't understood by asyncpg, which takes ssl= instead
+        rest = rest.replace("sslmode=", "ssl=")
+    return ASYNC_DRIVERS[backend] + sep + rest
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    # WAL lets readers keep going while a turn is being written
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def create_async_db_engine(url: str) -> AsyncEngine:
+    """Build the async engine using the DB_POOL_* settings"""
+    async_url = async_database_url(url)
+    sqlite = async_url.startswith("sqlite")
+    options = {
+        "pool_pre_ping": True,
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "300")),
+    }
+
+    if sqlite:
+        # SQLite allows one writer at a time and the others sleep-and-retry on the
+        # lock, so by default one shared connection queues requests fairly instead.
+        # (aiosqlite would otherwise use NullPool and open a connection per request.)
+        pool_size, max_overflow = "1", "0"
+        options["poolclass"] = AsyncAdaptedQueuePool
+        options["connect_args"] = {"timeout": float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))}
+    else:
+        pool_size, max_overflow = "10", "20"
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", pool_size)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", max_overflow)),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    )
+
+    engine = create_async_engine(async_url, **options)
+    if sqlite and os.getenv("SQLITE_WAL", "true").lower() in ("1", "true", "yes"):
+        event.listen(engine.sync_engine, "connect", _enable_sqlite_wal)
+    print(f"🗄️  Async database engine: {engine.dialect.name}+{engine.dialect.driver}, pool_size={options['pool_size']}")
+    return engine
+
+
+def create_session_factory(engine: AsyncEngine) -> async_sessionmaker:
+    # Keep attributes loaded after commit so responses don't trigger lazy reloads
+    return async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
@@ -0,0 +1,280 @@
+"""Content-addressed cache for /detect-llm results.
+
+Results are keyed on the SHA-256 of the decoded image bytes. When Pillow is
+available a 64-bit difference hash (dHash) is also kept per entry so that
+near-identical photos (re-encoded retries, tiny crops) can reuse a result.
+
+Two tiers:
+  * a bounded in-memory LRU
+  * an optional SQLite file that survives restarts
+Both tiers honour the same TTL.
+
+Callers on the event loop use akeys_for/aget/aput: memory hits are answered
+inline, while SQLite reads and writes and the phash decode run in a thread.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional - perceptual matching is disabled without it
+    Image = None
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Exact content key for an image"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes: bytes) -> Optional[int]:
+    """64-bit dHash of the image, or None if it can't be computed"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.draft("L", (64, 64))  # Let JPEG decode at reduced size
+            small = img.convert("L").resize((9, 8))
+            pixels = list(small.getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class DetectionCache:
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 24 * 3600,
+        disk_path: Optional[str] = None,
+        phash_threshold: int = 0,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.phash_threshold = phash_threshold
+        self.disk_path = disk_path
+
+        # digest -> (expires_at, phash, result)
+        self._memory: "OrderedDict[str, Tuple[float, Optional[int], dict]]" = OrderedDict()
+        self._lock = threading.Lock()  # memory tier and stats
+        self._disk_lock = threading.Lock()  # the SQLite connection, never held with _lock
+        self._disk: Optional[sqlite3.Connection] = None
+
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "phash_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, path: str):
+        try:
+            self._disk = sqlite3.connect(path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS detection_cache ("
+                " digest TEXT PRIMARY KEY,"
+                " phash INTEGER,"
+                " result TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS ix_detection_cache_expires ON detection_cache (expires_at)"
+            )
+            self._disk.commit()
+            print(f"🗃️  Detection cache disk tier: {path}")
+        except Exception as e:
+            print(f"❌ Detection cache disk tier unavailable: {e}")
+            self._disk = None
+
+    def keys_for(self, image_bytes: bytes) -> Tuple[str, Optional[int]]:
+        digest = image_digest(image_bytes)
+        phash = perceptual_hash(image_bytes) if self.phash_threshold > 0 else None
+        return digest, phash
+
+    async def akeys_for(self, image_bytes: bytes) -> Tuple[str, Optional[int]]:
+        """keys_for off the event loop (hashing a large image and the phash decode)"""
+        return await asyncio.to_thread(self.keys_for, image_bytes)
+
+    def _get_memory(self, digest: str, now: float) -> Optional[dict]:
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is None:
+                return None
+            if entry[0] > now:
+                self._memory.move_to_end(digest)
+                self.stats["memory_hits"] += 1
+                return entry[2]
+            del self._memory[digest]
+            self.stats["expired"] += 1
+            return None
+
+    def get(self, digest: str, phash: Optional[int] = None) -> Optional[dict]:
+        """Blocking lookup through every tier; use aget from async code"""
+        now = time.time()
+        result = self._get_memory(digest, now)
+        if result is not None:
+            return result
+        return self._get_slow(digest, phash, now)
+
+    async def aget(self, digest: str, phash: Optional[int] = None) -> Optional[dict]:
+        now = time.time()
+        result = self._get_memory(digest, now)
+        if result is not None:
+            return result
+        if self._disk is None:
+            return self._get_slow(digest, phash, now)
+        return await asyncio.to_thread(self._get_slow, digest, phash, now)
+
+    def _get_slow(self, digest: str, phash: Optional[int], now: float) -> Optional[dict]:
+        result = self._get_disk(digest, now)
+        with self._lock:
+            if result is not None:
+                self._put_memory(digest, now + self.ttl_seconds, phash, result)
+                self.stats["disk_hits"] += 1
+                return result
+
+            if phash is not None:
+                result = self._get_near_duplicate(phash, now)
+                if result is not None:
+                    self.stats["phash_hits"] += 1
+                    return result
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, digest: str, result: dict, phash: Optional[int] = None):
+        """Blocking store into every tier; use aput from async code"""
+        expires_at = self._put_memory_locked(digest, result, phash)
+        self._put_disk(digest, result, phash, expires_at)
+
+    async def aput(self, digest: str, result: dict, phash: Optional[int] = None):
+        expires_at = self._put_memory_locked(digest, result, phash)
+        if self._disk is not None:
+            await asyncio.to_thread(self._put_disk, digest, result, phash, expires_at)
+
+    def _put_memory_locked(self, digest: str, result: dict, phash: Optional[int]) -> float:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._put_memory(digest, expires_at, phash, result)
+            self.stats["stores"] += 1
+        return expires_at
+
+    def _put_disk(self, digest: str, result: dict, phash: Optional[int], expires_at: float):
+        if self._disk is None:
+            return
+        try:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO detection_cache (digest, phash, result, expires_at) VALUES (?, ?, ?, ?)",
+                    (digest, phash, json.dumps(result), expires_at),
+                )
+                self._disk.commit()
+        except Exception as e:
+            print(f"⚠️  Detection cache disk write failed: {e}")
+
+    def _put_memory(self, digest: str, expires_at: float, phash: Optional[int], result: dict):
+        self._memory[digest] = (expires_at, phash, result)
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _get_disk(self, digest: str, now: float) -> Optional[dict]:
+        if self._disk is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._disk.execute(
+                    "SELECT result, expires_at FROM detection_cache WHERE digest = ?", (digest,)
+                ).fetchone()
+                if row is not None and row[1] <= now:
+                    self._disk.execute("DELETE FROM detection_cache WHERE digest = ?", (digest,))
+                    self._disk.commit()
+        except Exception as e:
+            print(f"⚠️  Detection cache disk read failed: {e}")
+            return None
+        if row is None:
+            return None
+        if row[1] <= now:
+            with self._lock:
+                self.stats["expired"] += 1
+            return None
+        return json.loads(row[0])
+
+    def _get_near_duplicate(self, phash: int, now: float) -> Optional[dict]:
+        # The memory tier is bounded, so a linear scan stays cheap
+        best = None
+        best_distance = self.phash_threshold + 1
+        for expires_at, entry_phash, result in self._memory.values():
+            if entry_phash is None or expires_at <= now:
+                continue
+            distance = hamming_distance(phash, entry_phash)
+            if distance < best_distance:
+                best, best_distance = result, distance
+        return best
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers, returning how many were removed"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for digest in [d for d, entry in self._memory.items() if entry[0] <= now]:
+                del self._memory[digest]
+                removed += 1
+            self.stats["expired"] += removed
+        if self._disk is not None:
+            with self._disk_lock:
+                cursor = self._disk.execute("DELETE FROM detection_cache WHERE expires_at <= ?", (now,))
+                self._disk.commit()
+            with self._lock:
+                self.stats["expired"] += cursor.rowcount
+            removed += cursor.rowcount
+        return removed
+
+    def snapshot(self) -> dict:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["phash_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self._disk is not None,
+            "phash_enabled": self.phash_threshold > 0 and Image is not None,
+        }
+
+
+def cache_from_env() -> DetectionCache:
+    return DetectionCache(
+        max_entries=int(os.getenv("DETECTION_CACHE_SIZE", "512")),
+        ttl_seconds=float(os.getenv("DETECTION_CACHE_TTL", str(24 * 3600))),
+        disk_path=os.getenv("DETECTION_CACHE_PATH") or None,
+        phash_threshold=int(os.getenv("DETECTION_CACHE_PHASH_DISTANCE", "0")),
+    )
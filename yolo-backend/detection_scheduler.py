@@ -0,0 +1,129 @@
+"""Bounded-concurrency scheduling and retry policy for upstream detections.
+
+At most `max_concurrency` detections run at once and at most `max_queue`
+more may wait for a slot. Anything beyond that is rejected straight away
+so the endpoint can answer 503 instead of piling up work.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class SchedulerFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Detection queue is full")
+        self.retry_after = retry_after
+
+
+class DetectionScheduler:
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, queue_timeout: float = 20.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._admitted = 0
+        self._active = 0
+        self._wait_times = deque(maxlen=500)
+        self._run_times = deque(maxlen=500)
+        self.stats = {"completed": 0, "rejected": 0, "queue_timeouts": 0}
+
+    def _retry_after_hint(self) -> int:
+        # Rough guess at when a slot frees up, based on recent run times
+        if not self._run_times:
+            return 1
+        average = sum(self._run_times) / len(self._run_times)
+        backlog = (self._admitted - self._active + 1) / self.max_concurrency
+        return max(1, int(average * backlog + 0.5))
+
+    @asynccontextmanager
+    async def admission(self):
+        """Hold a place in the queue, or raise SchedulerFull straight away.
+
+        Admission is decided synchronously so a burst can't all slip past the
+        check. Work done inside the block before run_admitted (preprocessing)
+        only happens for requests that will actually be served.
+        """
+        if self._admitted >= self.max_concurrency + self.max_queue:
+            self.stats["rejected"] += 1
+            raise SchedulerFull(self._retry_after_hint())
+        self._admitted += 1
+        try:
+            yield
+        finally:
+            self._admitted -= 1
+
+    async def run_admitted(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Wait for a slot and run fn. Call inside admission()"""
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["queue_timeouts"] += 1
+            raise SchedulerFull(self._retry_after_hint())
+
+        started_at = time.perf_counter()
+        self._wait_times.append(started_at - queued_at)
+        self._active += 1
+        try:
+            return await fn()
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+            self._run_times.append(time.perf_counter() - started_at)
+            self.stats["completed"] += 1
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        async with self.admission():
+            return await self.run_admitted(fn)
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._wait_times)
+        return {
+            **self.stats,
+            "active": self._active,
+            "queue_depth": self._admitted - self._active,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "wait_ms_avg": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+            "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+            "wait_ms_max": round(1000 * waits[-1], 2) if waits else 0.0,
+        }
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait according to retry-after-ms / Retry-After, if present"""
+    retry_ms = headers.get("retry-after-ms")
+    if retry_ms:
+        try:
+            return float(retry_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(retry_after)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server asked for"""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
@@ -0,0 +1,116 @@
+"""Recent game events, kept so reconnecting clients get only what they missed.
+
+Every event that ConnectionManager sends for a game (its own broadcasts and
+those relayed from other workers) is appended here with a sequence number.
+The event id "<epoch>-<seq>" goes out with the event over WebSocket, SSE and
+long-poll, and clients send back the last id they saw to resume.
+
+Sequence numbers come from one counter per process, so they only increase,
+both within a game and across evictions. Each game keeps its last
+max_events, and at most max_games games are kept (least recently used are
+dropped). A resume that can't be answered exactly gets reset=True and the
+client reloads the game. That happens when the id is from another process
+or from before a restart (epoch mismatch), or when it is older than what
+was kept.
+"""
+
+import asyncio
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class _GameEvents:
+    def __init__(self, max_events: int, floor: int):
+        self.events: Deque[Tuple[int, dict]] = deque(maxlen=max_events)
+        # Newest seq no longer held; ids below it can't be resumed
+        self.floor = floor
+        self.changed = asyncio.Event()
+
+
+class GameEventLog:
+    def __init__(self, max_events: int = 100, max_games: int = 1024):
+        self.max_events = max_events
+        self.max_games = max_games
+        self.epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._games: "OrderedDict[str, _GameEvents]" = OrderedDict()
+        self._evicted_floor = 0
+        self.stats: Dict[str, int] = {"appended": 0, "resumed": 0, "resets": 0, "evicted_games": 0}
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def head(self) -> str:
+        """Id of the newest event in this process; resuming from it replays nothing"""
+        return self.event_id(self._seq)
+
+    def _parse(self, event_id: str) -> Optional[int]:
+        epoch, _, seq = event_id.rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _game(self, game_id: str) -> _GameEvents:
+        log = self._games.get(game_id)
+        if log is None:
+            log = self._games[game_id] = _GameEvents(self.max_events, self._evicted_floor)
+            while len(self._games) > self.max_games:
+                _, evicted = self._games.popitem(last=False)
+                if evicted.events:
+                    self._evicted_floor = max(self._evicted_floor, evicted.events[-1][0])
+                evicted.changed.set()  # waiters re-check and get a reset
+                self.stats["evicted_games"] += 1
+        self._games.move_to_end(game_id)
+        return log
+
+    def append(self, game_id: str, message: dict) -> dict:
+        """Record an event and return it with its event_id added"""
+        self._seq += 1
+        event = {**message, "event_id": self.event_id(self._seq)}
+        log = self._game(game_id)
+        if len(log.events) == log.events.maxlen:
+            log.floor = log.events[0][0]
+        log.events.append((self._seq, event))
+        self.stats["appended"] += 1
+        # Wake everyone waiting on this game and start a fresh event for the next wait
+        log.changed.set()
+        log.changed = asyncio.Event()
+        return event
+
+    def since(self, game_id: str, last_event_id: Optional[str]) -> Tuple[List[dict], bool]:
+        """Events after last_event_id, and whether the client has to reload instead"""
+        if not last_event_id:
+            return [], False
+        seq = self._parse(last_event_id)
+        log = self._games.get(game_id)
+        floor = log.floor if log else self._evicted_floor
+        if seq is None or seq > self._seq or seq < floor:
+            self.stats["resets"] += 1
+            return [], True
+        events = [event for event_seq, event in log.events if event_seq > seq] if log else []
+        if events:
+            self.stats["resumed"] += 1
+        return events, False
+
+    async def wait(self, game_id: str, last_event_id: Optional[str], timeout: float) -> Tuple[List[dict], bool]:
+        """Like since, but waits up to timeout seconds for something new"""
+        events, reset = self.since(game_id, last_event_id)
+        if events or reset:
+            return events, reset
+        changed = self._game(game_id).changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return [], False
+        return self.since(game_id, last_event_id)
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "epoch": self.epoch,
+            "head": self.head(),
+            "games": len(self._games),
+            "max_games": self.max_games,
+            "max_events": self.max_events,
+        }
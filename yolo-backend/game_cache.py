@@ -0,0 +1,202 @@
+"""Read-through cache of serialized GET /games/{game_id} responses.
+
+Each entry is the response body plus its ETag, so a hit skips both queries
+and the serialization. Writers invalidate after committing. Every game also
+has a generation that invalidate bumps. A reader notes the generation
+before querying, and its fill is dropped if a write landed in between, so a
+slow reader can't put an old board back into the cache.
+
+Backends:
+  * MemoryGameCache - bounded per-process LRU (one worker, or a short TTL)
+  * RedisGameCache  - any Redis-compatible server, shared by all workers
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional - only needed for GAME_CACHE=redis
+    aioredis = None
+
+
+class CachedGame(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def cached_game(body: bytes) -> CachedGame:
+    return CachedGame(body, '"' + hashlib.sha1(body).hexdigest() + '"')
+
+
+class MemoryGameCache:
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # game_id -> (expires_at, entry)
+        self._entries: "OrderedDict[str, Tuple[float, CachedGame]]" = OrderedDict()
+        # game_id -> stamp of its last invalidation. Stamps come from one counter;
+        # forgotten games report the newest stamp dropped, which is never too old.
+        self._generations: Dict[str, int] = {}
+        self._stamp = 0
+        self._forgotten_stamp = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "stale_fills": 0, "invalidations": 0, "evictions": 0}
+
+    async def get(self, game_id: str) -> Optional[CachedGame]:
+        item = self._entries.get(game_id)
+        if item is not None and item[0] > time.monotonic():
+            self._entries.move_to_end(game_id)
+            self.stats["hits"] += 1
+            return item[1]
+        if item is not None:
+            del self._entries[game_id]
+        self.stats["misses"] += 1
+        return None
+
+    async def generation(self, game_id: str) -> int:
+        return self._generations.get(game_id, self._forgotten_stamp)
+
+    async def set(self, game_id: str, entry: CachedGame, generation: int) -> bool:
+        if await self.generation(game_id) != generation:
+            self.stats["stale_fills"] += 1
+            return False
+        self._entries[game_id] = (time.monotonic() + self.ttl_seconds, entry)
+        self._entries.move_to_end(game_id)
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return True
+
+    async def invalidate(self, game_id: str):
+        self._entries.pop(game_id, None)
+        self._stamp += 1
+        # Re-insert so the dict stays ordered oldest stamp first
+        self._generations.pop(game_id, None)
+        self._generations[game_id] = self._stamp
+        self.stats["invalidations"] += 1
+        # Stamps only matter while a fill may be in flight; keep the map bounded
+        while len(self._generations) > self.max_entries:
+            oldest = next(iter(self._generations))
+            self._forgotten_stamp = self._generations.pop(oldest)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "backend": "memory",
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    async def aclose(self):
+        pass
+
+
+# Store the entry only if the generation is still the one the reader saw
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class RedisGameCache:
+    def __init__(self, url: str, ttl_seconds: float = 300, prefix: str = "twovue:"):
+        if aioredis is None:
+            raise RuntimeError("GAME_CACHE=redis needs the redis package (pip install redis)")
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+        self._set_if_generation = self._redis.register_script(_SET_IF_GENERATION)
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "stale_fills": 0, "invalidations": 0, "errors": 0}
+
+    def _keys(self, game_id: str) -> Tuple[str, str]:
+        return f"{self.prefix}game:{game_id}", f"{self.prefix}game-gen:{game_id}"
+
+    async def get(self, game_id: str) -> Optional[CachedGame]:
+        try:
+            value = await self._redis.get(self._keys(game_id)[0])
+        except Exception as e:
+            # The database is still the source of truth - treat an outage as a miss
+            self.stats["errors"] += 1
+            print(f"⚠️  Game cache read failed: {e}")
+            return None
+        if value is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        etag, _, body = value.partition(b"\n")
+        return CachedGame(body, etag.decode())
+
+    async def generation(self, game_id: str) -> int:
+        try:
+            return int(await self._redis.get(self._keys(game_id)[1]) or 0)
+        except Exception:
+            self.stats["errors"] += 1
+            return -1  # never matches, so the fill is skipped
+
+    async def set(self, game_id: str, entry: CachedGame, generation: int) -> bool:
+        try:
+            stored = await self._set_if_generation(
+                keys=list(self._keys(game_id)),
+                args=[str(generation), entry.etag.encode() + b"\n" + entry.body, int(self.ttl_seconds)],
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"⚠️  Game cache write failed: {e}")
+            return False
+        self.stats["stores" if stored else "stale_fills"] += 1
+        return bool(stored)
+
+    async def invalidate(self, game_id: str):
+        entry_key, generation_key = self._keys(game_id)
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.incr(generation_key)
+                pipe.expire(generation_key, max(int(self.ttl_seconds) * 2, 3600))
+                pipe.delete(entry_key)
+                await pipe.execute()
+            self.stats["invalidations"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"❌ Game cache invalidation failed for {game_id}: {e}")
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "backend": "redis",
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+
+def game_cache_from_env():
+    """GAME_CACHE=memory (default), redis or off"""
+    backend = os.getenv("GAME_CACHE", "memory").lower()
+    ttl = float(os.getenv("GAME_CACHE_TTL", "300"))
+    if backend == "off":
+        return None
+    if backend == "redis":
+        url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        try:
+            cache = RedisGameCache(url, ttl_seconds=ttl, prefix=os.getenv("GAME_CACHE_PREFIX", "twovue:"))
+            print(f"🧠 Game cache: redis ({url.split('@')[-1]}), ttl {ttl:.0f}s")
+            return cache
+        except RuntimeError as e:
+            print(f"⚠️  {e} - falling back to the in-memory game cache")
+    cache = MemoryGameCache(max_entries=int(os.getenv("GAME_CACHE_SIZE", "1024")), ttl_seconds=ttl)
+    print(f"🧠 Game cache: memory ({cache.max_entries} games), ttl {ttl:.0f}s")
+    return cache
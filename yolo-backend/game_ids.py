@@ -0,0 +1,121 @@
+"""Collision-free allocation of the typeable game ids (quantum-matrix-prime).
+
+The three word lists give only 41 x 52 x 18 = 38,376 ids, so picking one at
+random starts colliding well before the table is full (the birthday bound
+hits ~50% around 230 games). The allocator keeps the words but appends a
+numeric segment once the space gets crowded - quantum-matrix-prime-42 - and
+picks its width so the expected load stays under target_load. Uniqueness
+itself comes from the primary key: create_game inserts and, on a conflict,
+asks for another id, which is drawn from a wider tier every few collisions.
+The final attempt uses a random hex segment, so allocation always ends.
+"""
+
+import random
+import secrets
+from typing import Dict
+
+SCIENTIFIC_ADJECTIVES = [
+    'quantum', 'atomic', 'neural', 'stellar', 'cosmic', 'optical', 'kinetic', 
+    'thermal', 'magnetic', 'electric', 'photonic', 'sonic', 'crystalline',
+    'molecular', 'orbital', 'plasma', 'gamma', 'alpha', 'beta', 'delta',
+    'micro', 'nano', 'meta', 'ultra', 'hyper', 'neo', 'proto', 'pseudo',
+    'cyber', 'digital', 'analog', 'synthetic', 'organic', 'bionic', 'ionic',
+    'spectral', 'temporal', 'spatial', 'dimensional', 'fractal', 'holographic'
+]
+
+SCIENTIFIC_NOUNS = [
+    'vector', 'matrix', 'prism', 'catalyst', 'reactor', 'generator', 'scanner',
+    'analyzer', 'synthesizer', 'amplifier', 'detector', 'sensor', 'probe',
+    'beacon', 'transmitter', 'receiver', 'oscillator', 'resonator', 'capacitor',
+    'conductor', 'isolator', 'converter', 'processor', 'calculator', 'computer',
+    'algorithm', 'protocol', 'sequence', 'pattern', 'frequency', 'wavelength',
+    'spectrum', 'field', 'chamber', 'module', 'unit', 'device', 'apparatus',
+    'instrument', 'mechanism', 'engine', 'turbine', 'dynamo', 'circuit',
+    'array', 'grid', 'network', 'system', 'core', 'nexus', 'hub', 'node'
+]
+
+SCIENTIFIC_SUFFIXES = [
+    'alpha', 'beta', 'gamma', 'delta', 'omega', 'prime', 'max', 'ultra',
+    'plus', 'neo', 'pro', 'x', 'z', 'one', 'two', 'three', 'seven', 'nine'
+]
+
+BASE_SPACE = len(SCIENTIFIC_ADJECTIVES) * len(SCIENTIFIC_NOUNS) * len(SCIENTIFIC_SUFFIXES)
+MAX_WIDTH = 9  # digits in the numeric segment
+COLLISIONS_PER_WIDTH = 2
+
+
+def generate_scientific_game_id(width: int = 0) -> str:
+    """adjective-noun-suffix, plus a `width`-digit number when width > 0"""
+    words = [
+        random.choice(SCIENTIFIC_ADJECTIVES),
+        random.choice(SCIENTIFIC_NOUNS),
+        random.choice(SCIENTIFIC_SUFFIXES),
+    ]
+    if width > 0:
+        # No leading zeros, so every width is its own disjoint tier
+        words.append(str(random.randrange(10 ** (width - 1), 10 ** width)))
+    return "-".join(words)
+
+
+def tier_capacity(width: int) -> int:
+    return BASE_SPACE if width == 0 else BASE_SPACE * 9 * 10 ** (width - 1)
+
+
+class GameIdAllocator:
+    def __init__(self, max_attempts: int = 8, target_load: float = 0.1, recount_every: int = 1000):
+        self.max_attempts = max(max_attempts, 2)
+        self.target_load = target_load
+        self.recount_every = recount_every
+        # Roughly how many games exist; create_game recounts from the database
+        # every recount_every allocations so other workers' games are included
+        self.known_games = 0
+        self._since_recount = None
+        self.stats: Dict[str, int] = {"allocated": 0, "collisions": 0, "widened": 0, "fallbacks": 0}
+
+    def base_width(self) -> int:
+        """Narrowest tier whose load would stay under target_load"""
+        width = 0
+        while width < MAX_WIDTH and self.known_games >= self.target_load * tier_capacity(width):
+            width += 1
+        return width
+
+    def candidate(self, attempt: int) -> str:
+        """Id to try on the given attempt (0 first); later attempts draw from wider tiers"""
+        if attempt >= self.max_attempts - 1:
+            self.stats["fallbacks"] += 1
+            return generate_scientific_game_id() + "-" + secrets.token_hex(6)
+        width = min(self.base_width() + attempt // COLLISIONS_PER_WIDTH, MAX_WIDTH)
+        if width > 0:
+            self.stats["widened"] += 1
+        return generate_scientific_game_id(width)
+
+    def needs_recount(self) -> bool:
+        return self._since_recount is None or self._since_recount >= self.recount_every
+
+    def recounted(self, games: int):
+        self.known_games = games
+        self._since_recount = 0
+
+    def collided(self):
+        self.stats["collisions"] += 1
+
+    def allocated(self):
+        self.stats["allocated"] += 1
+        self.known_games += 1
+        if self._since_recount is not None:
+            self._since_recount += 1
+
+    def snapshot(self) -> dict:
+        attempts = self.stats["allocated"] + self.stats["collisions"]
+        width = self.base_width()
+        return {
+            **self.stats,
+            "collision_rate": round(self.stats["collisions"] / attempts, 4) if attempts else 0.0,
+            "known_games": self.known_games,
+            "base_space": BASE_SPACE,
+            "width": width,
+            "tier_capacity": tier_capacity(width),
+            "load": round(self.known_games / tier_capacity(width), 4),
+            "max_attempts": self.max_attempts,
+            "target_load": self.target_load,
+        }
@@ -0,0 +1,52 @@
+"""Shared outbound HTTP client for the OpenAI API.
+
+One pooled httpx.AsyncClient is created when the app starts and reused by
+every detection so requests don't pay for a new TCP/TLS handshake each time.
+"""
+
+import os
+
+import httpx
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def openai_timeout() -> httpx.Timeout:
+    """Per-request timeouts from the OPENAI_*_TIMEOUT settings"""
+    return httpx.Timeout(
+        connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+        read=float(os.getenv("OPENAI_READ_TIMEOUT", "30")),
+        write=float(os.getenv("OPENAI_WRITE_TIMEOUT", "10")),
+        pool=float(os.getenv("OPENAI_POOL_TIMEOUT", "5")),
+    )
+
+
+def attempt_timeout(timeout: httpx.Timeout) -> float:
+    """Longest a single request can take before every phase times out"""
+    return timeout.pool + timeout.connect + timeout.write + timeout.read
+
+
+def create_openai_client(base_url: str = OPENAI_BASE_URL) -> httpx.AsyncClient:
+    """Build the long-lived client using the OPENAI_* pool/timeout settings"""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+    )
+    timeout = openai_timeout()
+
+    http2 = os.getenv("OPENAI_HTTP2", "true").lower() in ("1", "true", "yes")
+    if http2 and not _http2_available():
+        print("⚠️  OPENAI_HTTP2 requested but the h2 package is missing - using HTTP/1.1")
+        http2 = False
+
+    print(f"🔌 OpenAI client: {limits.max_connections} connections, http2={http2}")
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout, http2=http2)
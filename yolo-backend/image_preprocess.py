@@ -0,0 +1,124 @@
+"""Shrink camera photos for vision inference and for serving to the app.
+
+preprocess_image is a plain function of bytes so it can run in a
+ProcessPoolExecutor and keep Pillow's CPU work off the event loop.
+"""
+
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import Executor
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+MAX_EDGE = int(os.getenv("DETECTION_IMAGE_MAX_EDGE", "1024"))
+JPEG_QUALITY = int(os.getenv("DETECTION_IMAGE_QUALITY", "80"))
+# "auto" picks low detail for small images, otherwise "low" or "high" is forced
+DETAIL = os.getenv("DETECTION_IMAGE_DETAIL", "auto")
+LOW_DETAIL_MAX_EDGE = 512
+
+# File extensions this Pillow build can open (HEIC/HEIF only with a plugin such as pillow-heif)
+DECODABLE_EXTENSIONS = {extension.lstrip(".").lower() for extension in Image.registered_extensions()}
+
+
+def choose_detail(width: int, height: int, detail: str = DETAIL) -> str:
+    if detail in ("low", "high"):
+        return detail
+    return "low" if max(width, height) <= LOW_DETAIL_MAX_EDGE else "high"
+
+
+def preprocess_image(image_bytes: bytes, max_edge: int = MAX_EDGE, quality: int = JPEG_QUALITY, detail: str = DETAIL) -> dict:
+    """Decode, EXIF-orient, downscale and re-encode an image as JPEG"""
+    start = time.perf_counter()
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        original_size = img.size
+        # Let the JPEG decoder skip straight to a nearby scale when the photo is huge
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        output = io.BytesIO()
+        img.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+        width, height = img.size
+
+    processed = output.getvalue()
+    # Never make things worse: keep the original if re-encoding didn't help
+    if len(processed) >= len(image_bytes) and max(original_size) <= max_edge:
+        processed = image_bytes
+
+    return {
+        "image": processed,
+        "width": width,
+        "height": height,
+        "original_width": original_size[0],
+        "original_height": original_size[1],
+        "original_bytes": len(image_bytes),
+        "processed_bytes": len(processed),
+        "detail": choose_detail(width, height, detail),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+class PreprocessStats:
+    def __init__(self):
+        self.images = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_ms = 0.0
+
+    def record(self, result: dict):
+        self.images += 1
+        self.bytes_in += result["original_bytes"]
+        self.bytes_out += result["processed_bytes"]
+        self.total_ms += result["elapsed_ms"]
+
+    def snapshot(self) -> dict:
+        return {
+            "images": self.images,
+            "failures": self.failures,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "avg_ms": round(self.total_ms / self.images, 2) if self.images else 0.0,
+        }
+
+
+async def preprocess_in_pool(executor: Optional[Executor], image_bytes: bytes) -> dict:
+    """Run preprocess_image in the given pool (or inline when there is none)"""
+    if executor is None:
+        return preprocess_image(image_bytes)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, preprocess_image, image_bytes)
+
+
+def render_variants(image_bytes: bytes, specs: list) -> dict:
+    """Render (name, max_edge, format, quality) specs from one decode of the image"""
+    rendered = {}
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        largest = max(spec[1] for spec in specs)
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        for name, max_edge, fmt, quality in specs:
+            variant = img.copy()
+            variant.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            output = io.BytesIO()
+            if fmt == "webp":
+                variant.save(output, format="WEBP", quality=quality, method=4)
+            else:
+                variant.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+            rendered[name] = output.getvalue()
+    return rendered
+
+
+async def render_variants_in_pool(executor: Optional[Executor], image_bytes: bytes, specs: list) -> dict:
+    if executor is None:
+        return render_variants(image_bytes, specs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, render_variants, image_bytes, specs)
@@ -0,0 +1,222 @@
+"""Turn a vision model's reply into clean, canonical object labels.
+
+detect_with_openai asks for structured output: JSON matching LABELS_SCHEMA,
+which parse_structured reads directly. When the reply is free text anyway
+(a model without structured outputs, or a refusal), parse_free_text
+extracts the list with precompiled patterns in a single pass over the items.
+
+Every label then goes through canonical_label. It lowercases the label,
+strips articles and punctuation, singularizes the last word and maps
+synonyms, so "Sofas", "a couch" and "couch." all become "couch".
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+MAX_LABELS = 30
+
+# Sent as response_format so the reply is {"objects": [...]} and nothing else
+LABELS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "objects": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Specific, tangible objects visible in the photo, most prominent first",
+        },
+    },
+    "required": ["objects"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "scavenger_hunt_objects", "strict": True, "schema": LABELS_SCHEMA},
+}
+
+SYNONYMS: Dict[str, str] = {
+    "sofa": "couch",
+    "settee": "couch",
+    "tv": "television",
+    "tv screen": "television",
+    "television set": "television",
+    "cellphone": "phone",
+    "cell phone": "phone",
+    "mobile phone": "phone",
+    "telephone": "phone",
+    "smart phone": "smartphone",
+    "iphone": "smartphone",
+    "laptop computer": "laptop",
+    "notebook computer": "laptop",
+    "computer mouse": "mouse",
+    "computer monitor": "monitor",
+    "computer screen": "monitor",
+    "computer keyboard": "keyboard",
+    "remote": "remote control",
+    "tv remote": "remote control",
+    "coffee mug": "mug",
+    "eyeglass": "glasses",
+    "eyeglasses": "glasses",
+    "spectacles": "glasses",
+    "trash bin": "trash can",
+    "garbage can": "trash can",
+    "waste bin": "trash can",
+    "wastebasket": "trash can",
+    "potted plant": "plant",
+    "houseplant": "plant",
+    "house plant": "plant",
+    "photo frame": "picture frame",
+    "frame": "picture frame",
+    "power outlet": "outlet",
+    "electrical outlet": "outlet",
+    "wall outlet": "outlet",
+    "light switch": "switch",
+    "ceiling light": "light",
+    "light fixture": "light",
+    "rug": "carpet",
+    "bookcase": "bookshelf",
+    "book shelf": "bookshelf",
+    "drinking glass": "glass",
+    "cushion": "pillow",
+    "throw pillow": "pillow",
+    "earbuds": "headphones",
+    "earphones": "headphones",
+    "headset": "headphones",
+    "handbag": "bag",
+    "purse": "bag",
+    "water jug": "jug",
+}
+
+# Plural forms the suffix rules would get wrong
+IRREGULAR_PLURALS: Dict[str, str] = {
+    "people": "person", "persons": "person", "children": "child", "men": "man",
+    "women": "woman", "feet": "foot", "teeth": "tooth", "mice": "mouse",
+    "knives": "knife", "shelves": "shelf", "leaves": "leaf", "loaves": "loaf",
+    "scarves": "scarf", "wolves": "wolf", "halves": "half", "lives": "life",
+    "potatoes": "potato", "tomatoes": "tomato", "buses": "bus", "cacti": "cactus",
+    "dice": "die", "geese": "goose", "oxen": "ox", "radii": "radius",
+    "bookshelves": "bookshelf", "pocketknives": "pocketknife",
+}
+
+# Plurals of words ending in -ie, which the -ies -> -y rule would mangle
+IE_PLURALS = {
+    "cookies", "brownies", "movies", "pies", "ties", "bowties", "hoodies",
+    "beanies", "selfies", "smoothies", "zombies", "calories", "goalies",
+    "onesies", "veggies", "lingeries", "rookies", "walkies",
+}
+
+# Words that are already singular, or only come in the plural
+UNCOUNTED = {
+    "glasses", "scissors", "headphones", "pants", "jeans", "shorts", "clothes",
+    "tongs", "pliers", "binoculars", "goggles", "series", "species", "news",
+    "tennis", "chess", "grass", "glass", "class", "dress", "mattress", "compass",
+    "cactus", "virus", "bus", "canvas", "lens", "iris", "chassis", "blinds",
+    "sunglasses", "trousers", "leggings", "pajamas", "tweezers", "electronics",
+}
+
+STOPWORDS = {"the", "and", "or", "a", "an", "is", "are", "it", "this", "that", "etc", "other", "others", "various", "objects", "items"}
+
+# Items are separated by commas, semicolons, newlines, "and" or "&"
+_ITEM_SPLIT = re.compile(r"[,;\n]+|\s+(?:and|&)\s+", re.IGNORECASE)
+# Everything that isn't part of an object name, removed from each item in one
+# re.sub: leading bullets and numbering, markdown, parentheticals, and the
+# conversational phrases as one alternation
+_JUNK = re.compile(
+    r"^\s*(?:[-*•>]+|\d+[.)]|[a-z][.)](?=\s))\s*"
+    r"|\*\*|__|`|\([^)]*\)|\[[^\]]*\]"
+    r"|\b(?:here(?:'s| is| are)(?: a| the)?(?: list(?: of)?)?|sure|certainly|of course|"
+    r"i (?:can |also )?(?:see|identify|spot|notice|like|love)|there (?:is|are)|the (?:image|photo|picture) (?:shows|contains|includes)|"
+    r"(?:in|from) the (?:image|photo|picture)|(?:detected |visible )?objects include|"
+    r"(?:list of )?(?:detected |visible |prominent )?(?:objects|items)(?: in the (?:image|photo))?|"
+    r"(?:some|several|a few) (?:of the )?(?:objects|items)|such as|including|like)\b[\s:]*",
+    re.IGNORECASE,
+)
+_ARTICLE = re.compile(r"^(?:a|an|the|some|two|three|several|many|few|multiple|various)\s+", re.IGNORECASE)
+_EDGE_PUNCTUATION = " \t.,!?;:\"'()[]{}*-–—"
+_WHITESPACE = re.compile(r"\s+")
+# Longer than this is a sentence, not an object name
+MAX_LABEL_WORDS = 4
+
+
+def singularize(word: str) -> str:
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word in IE_PLURALS:
+        return word[:-1]
+    if word in UNCOUNTED or len(word) <= 3 or not word.endswith("s"):
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if word.endswith(("ss", "us", "is")):
+        return word
+    return word[:-1]
+
+
+@lru_cache(maxsize=4096)
+def canonical_label(label: str) -> str:
+    """Lowercase, trim, singularize the head noun and map synonyms. "" if nothing is left"""
+    label = _WHITESPACE.sub(" ", label.lower()).strip(_EDGE_PUNCTUATION)
+    label = _ARTICLE.sub("", label)
+    if not label:
+        return ""
+    if label in SYNONYMS:
+        return SYNONYMS[label]
+    words = label.split(" ")
+    words[-1] = singularize(words[-1])
+    label = " ".join(words)
+    return SYNONYMS.get(label, label)
+
+
+def _keep(label: str) -> bool:
+    return (
+        len(label) > 2
+        and label not in STOPWORDS
+        and not label.startswith("http")
+        and label.count(" ") < MAX_LABEL_WORDS
+    )
+
+
+def parse_structured(content: str) -> Optional[List[str]]:
+    """The "objects" list from a structured-output reply, or None if it isn't one"""
+    if not content.lstrip().startswith(("{", "[")):
+        return None
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    objects = data.get("objects") if isinstance(data, dict) else data
+    if not isinstance(objects, list):
+        return None
+    return [str(item) for item in objects if isinstance(item, (str, int, float))]
+
+
+def parse_free_text(content: str) -> List[str]:
+    """Candidate labels from a prose or list-shaped reply, in one pass over its items"""
+    items = []
+    for item in _ITEM_SPLIT.split(content):
+        # "Here are the objects: chair" / "Furniture: chair" - keep what follows the colon
+        item = item.rpartition(":")[2]
+        item = _JUNK.sub(" ", item)
+        if item.strip():
+            items.append(item)
+    return items
+
+
+def extract_labels(content: str, limit: int = MAX_LABELS) -> Tuple[List[str], int, str]:
+    """Canonical, de-duplicated labels from a reply. Returns (labels, raw_count, format)"""
+    content = content or ""
+    raw = parse_structured(content)
+    fmt = "json"
+    if raw is None:
+        raw = parse_free_text(content)
+        fmt = "text"
+    labels: Dict[str, None] = {}
+    for item in raw:
+        label = canonical_label(item)
+        if _keep(label):
+            labels[label] = None
+    return list(labels)[:limit], len(raw), fmt
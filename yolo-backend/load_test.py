@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Closed-loop load test for the game endpoints.
+
+Seeds a few games with turns, then runs --concurrency workers for --duration
+seconds. Each worker loops over a read-heavy mix like the app produces
+(mostly GET /games/{id}, some turn submissions and new games) and records
+per-request latency. Save a run and compare another run against it:
+
+    python load_test.py --base-url http://localhost:8000 --save before.json
+    python load_test.py --base-url http://localhost:8000 --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+# (operation, weight)
+MIX = [("get_game", 80), ("submit_turn", 15), ("create_game", 5)]
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+async def seed_games(client: httpx.AsyncClient, games: int, turns: int) -> list:
+    game_ids = []
+    for g in range(games):
+        game_id = (await client.post("/games", json={"player1_name": f"load-{g}"})).json()["game_id"]
+        await client.post(f"/games/{game_id}/join", json={"player2_name": f"load-{g}-b"})
+        for _ in range(turns):
+            await submit_turn(client, game_id)
+        game_ids.append(game_id)
+    return game_ids
+
+
+async def submit_turn(client: httpx.AsyncClient, game_id: str) -> httpx.Response:
+    return await client.post(
+        f"/games/{game_id}/turns",
+        headers={"Idempotency-Key": str(uuid.uuid4())},
+        json={
+            "player_name": "load",
+            "photo_url": f"https://example.com/{uuid.uuid4()}.jpg",
+            "tags": ["chair", "lamp"],
+            "shared_tag": "chair",
+            "detected_tags": ["chair", "lamp", "table", "window"],
+        },
+    )
+
+
+async def run(base_url: str, concurrency: int, duration: float, games: int, turns: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        game_ids = await seed_games(client, games, turns)
+        print(f"🌱 Seeded {games} games with {turns} turns each")
+
+        latencies = defaultdict(list)
+        statuses = Counter()
+        operations, weights = zip(*MIX)
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                op = random.choices(operations, weights)[0]
+                started = time.perf_counter()
+                try:
+                    if op == "get_game":
+                        response = await client.get(f"/games/{random.choice(game_ids)}")
+                    elif op == "submit_turn":
+                        response = await submit_turn(client, random.choice(game_ids))
+                    else:
+                        response = await client.post("/games", json={"player1_name": "load-new"})
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                latencies[op].append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    every = [ms for values in latencies.values() for ms in values]
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(every),
+        "throughput_rps": round(len(every) / elapsed, 1),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "latency_ms": {
+            op: {
+                "count": len(values),
+                "p50": round(statistics.median(values), 2),
+                "p95": round(percentile(values, 0.95), 2),
+                "p99": round(percentile(values, 0.99), 2),
+            }
+            for op, values in sorted(latencies.items())
+        },
+    }
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"📊 {result['requests']} requests in {result['duration_s']}s at concurrency {result['concurrency']}")
+    line = f"   throughput {result['throughput_rps']} req/s"
+    if baseline:
+        line += f"  (baseline {baseline['throughput_rps']} req/s, x{result['throughput_rps'] / max(baseline['throughput_rps'], 0.1):.2f})"
+    print(line)
+    print(f"   statuses {result['statuses']}")
+    for op, stats in result["latency_ms"].items():
+        line = f"   {op:<12} n={stats['count']:<6} p50={stats['p50']:8.2f}ms p95={stats['p95']:8.2f}ms p99={stats['p99']:8.2f}ms"
+        before = (baseline or {}).get("latency_ms", {}).get(op)
+        if before:
+            line += f"   (baseline p50={before['p50']:.2f}ms p99={before['p99']:.2f}ms)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=20, help="turns seeded per game")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --save run")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.base_url, args.concurrency, args.duration, args.games, args.turns))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Saved results to {args.save}")
+
+    errors = sum(v for k, v in result["statuses"].items() if not k.startswith("2"))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Object detection on the CPU with a local YOLO model (ONNX Runtime).
+
+An alternative to the OpenAI call for /detect-llm, /detect and
+/upload-and-detect, selected with DETECTION_BACKEND:
+
+  * openai         - GPT-4o only (the default)
+  * local          - this model only; no network, no per-image cost. If the
+                     model can't run, detections come back empty rather
+                     than falling back to GPT-4o
+  * local-then-llm - this model first, and GPT-4o only when it finds fewer
+                     than LOCAL_DETECTION_MIN_LABELS objects
+
+Inference runs in its own process pool, with each worker holding one
+InferenceSession. Requests go through a MicroBatcher, which groups
+concurrent images into one batch of up to DETECTOR_MAX_BATCH and waits at
+most DETECTOR_MAX_WAIT_MS for a batch to fill. While every worker is busy,
+new images keep joining the next batch.
+
+Needs `pip install onnxruntime numpy` and a YOLOv5/v8 model exported to ONNX,
+e.g. `yolo export model=yolov8n.pt format=onnx dynamic=True`.
+"""
+
+import ast
+import asyncio
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from detection_scheduler import SchedulerFull
+from label_parser import canonical_label
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+except ImportError:  # only needed for DETECTION_BACKEND=local / local-then-llm
+    np = None
+    ort = None
+
+DETECTION_BACKENDS = ("openai", "local", "local-then-llm")
+
+COCO_NAMES = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat",
+    "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "backpack",
+    "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard", "sports ball",
+    "kite", "baseball bat", "baseball glove", "skateboard", "surfboard", "tennis racket",
+    "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair",
+    "couch", "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink",
+    "refrigerator", "book", "clock", "vase", "scissors", "teddy bear", "hair drier",
+    "toothbrush",
+]
+
+# Per-worker state, set up by _init_worker in each pool process
+_session = None
+_names: List[str] = []
+_input_size: Tuple[int, int] = (640, 640)
+_fixed_batch: Optional[int] = None
+
+
+def _load_names(session, labels_path: Optional[str]) -> List[str]:
+    """Class names from a labels file, else the model's metadata, else COCO"""
+    if labels_path:
+        with open(labels_path) as f:
+            return [line.strip() for line in f if line.strip()]
+    metadata = session.get_modelmeta().custom_metadata_map
+    if "names" in metadata:
+        # Ultralytics exports store "{0: 'person', 1: 'bicycle', ...}"
+        names = ast.literal_eval(metadata["names"])
+        return [names[i] for i in sorted(names)]
+    return COCO_NAMES
+
+
+def _init_worker(model_path: str, labels_path: Optional[str], threads: int, input_size: int):
+    global _session, _names, _input_size, _fixed_batch
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    _session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+    _names = _load_names(_session, labels_path)
+    batch, _, height, width = _session.get_inputs()[0].shape
+    _input_size = (
+        height if isinstance(height, int) else input_size,
+        width if isinstance(width, int) else input_size,
+    )
+    # Models exported without dynamic=True only take batches of exactly this size
+    _fixed_batch = batch if isinstance(batch, int) else None
+
+
+def _letterbox(image_bytes: bytes) -> "np.ndarray":
+    """Decode, orient and fit an image into the model input with grey padding, as CHW float32"""
+    height, width = _input_size
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft("RGB", (width, height))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((width, height), Image.BILINEAR)
+        canvas = Image.new("RGB", (width, height), (114, 114, 114))
+        canvas.paste(img, ((width - img.width) // 2, (height - img.height) // 2))
+    return np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+
+
+def _class_scores(output: "np.ndarray") -> "np.ndarray":
+    """Best score per class for each image, shape (batch, classes)"""
+    if output.shape[1] < output.shape[2]:
+        # YOLOv8: (batch, 4 + classes, anchors)
+        return output[:, 4:, :].max(axis=2)
+    # YOLOv5: (batch, anchors, 5 + classes), class scores scaled by objectness
+    return (output[:, :, 5:] * output[:, :, 4:5]).max(axis=1)
+
+
+def _infer(batch: "np.ndarray") -> "np.ndarray":
+    input_name = _session.get_inputs()[0].name
+    if _fixed_batch is None:
+        return _class_scores(_session.run(None, {input_name: batch})[0])
+    scores = []
+    for start in range(0, len(batch), _fixed_batch):
+        chunk = batch[start:start + _fixed_batch]
+        padding = _fixed_batch - len(chunk)
+        if padding:
+            chunk = np.concatenate([chunk, np.zeros((padding, *chunk.shape[1:]), dtype=np.float32)])
+        scores.append(_class_scores(_session.run(None, {input_name: chunk})[0])[:_fixed_batch - padding])
+    return np.concatenate(scores)
+
+
+def detect_batch(images: List[bytes], confidence: float, max_labels: int) -> List[dict]:
+    """Run one batch in a pool worker. Only the distinct labels are needed, so
+    there are no boxes and no NMS, just each class's best score."""
+    start = time.perf_counter()
+    tensors, errors = [], {}
+    for i, image_bytes in enumerate(images):
+        try:
+            tensors.append(_letterbox(image_bytes))
+        except Exception as e:
+            errors[i] = str(e)
+    scores = _infer(np.stack(tensors)) if tensors else []
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    results, row = [], 0
+    for i in range(len(images)):
+        if i in errors:
+            results.append({"error": errors[i], "labels": []})
+            continue
+        image_scores = scores[row]
+        row += 1
+        ranked = [int(c) for c in np.argsort(-image_scores) if image_scores[c] >= confidence][:max_labels]
+        results.append({
+            "labels": [_names[c] if c < len(_names) else f"class {c}" for c in ranked],
+            "scores": [round(float(image_scores[c]), 3) for c in ranked],
+            "batch_size": len(images),
+            "inference_ms": elapsed_ms,
+        })
+    return results
+
+
+def warm_up() -> float:
+    """One dummy inference so the first real request doesn't pay for graph setup"""
+    start = time.perf_counter()
+    _infer(np.zeros((1, 3, *_input_size), dtype=np.float32))
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+class MicroBatcher:
+    """Groups concurrent submissions into batches for run_batch.
+
+    A batch is dispatched once it has max_batch items or its first item has
+    waited max_wait seconds. At most max_in_flight batches run at once, and
+    while they're busy, arrivals keep filling the next batch. Past max_queue
+    waiting items, submit raises SchedulerFull.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch: int = 8,
+        max_wait: float = 0.01,
+        max_in_flight: int = 1,
+        max_queue: int = 64,
+    ):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._pending: Deque[Tuple[Any, asyncio.Future, float]] = deque()
+        self._arrived: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self._batch_sizes: Deque[int] = deque(maxlen=500)
+        self._wait_times: Deque[float] = deque(maxlen=500)
+        self._run_times: Deque[float] = deque(maxlen=500)
+        self.stats: Dict[str, int] = {"items": 0, "batches": 0, "errors": 0, "rejected": 0}
+
+    def start(self):
+        self._arrived = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def submit(self, item: Any) -> Any:
+        if len(self._pending) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise SchedulerFull(1)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        self._arrived.set()
+        return await future
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._pending:
+                self._arrived.clear()
+                await self._arrived.wait()
+            deadline = loop.time() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            # Taken only once a worker is free, so the batch includes late arrivals
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                entry = self._pending.popleft()
+                if not entry[1].done():  # the caller may have given up
+                    batch.append(entry)
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        started = time.perf_counter()
+        self._wait_times.extend(started - queued_at for _, _, queued_at in batch)
+        try:
+            results = await self.run_batch([item for item, _, _ in batch])
+        except Exception as e:
+            self.stats["errors"] += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+            self.stats["items"] += len(batch)
+            self.stats["batches"] += 1
+            self._batch_sizes.append(len(batch))
+            self._run_times.append(time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        def avg_ms(values):
+            return round(sum(values) / len(values) * 1000, 2) if values else 0.0
+
+        return {
+            **self.stats,
+            "queue_depth": len(self._pending),
+            "in_flight": len(self._running),
+            "avg_batch_size": round(sum(self._batch_sizes) / len(self._batch_sizes), 2) if self._batch_sizes else 0.0,
+            "max_batch_seen": max(self._batch_sizes, default=0),
+            "avg_wait_ms": avg_ms(self._wait_times),
+            "avg_run_ms": avg_ms(self._run_times),
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+    async def aclose(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        while self._pending:
+            _, future, _ = self._pending.popleft()
+            if not future.done():
+                future.set_exception(RuntimeError("Detector is shutting down"))
+
+
+class LocalDetector:
+    def __init__(
+        self,
+        model_path: str,
+        labels_path: Optional[str] = None,
+        workers: int = 1,
+        threads_per_worker: int = 2,
+        input_size: int = 640,
+        confidence: float = 0.25,
+        max_labels: int = 30,
+        max_batch: int = 8,
+        max_wait_ms: float = 10,
+        max_queue: int = 64,
+    ):
+        self.model_path = model_path
+        self.labels_path = labels_path
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.input_size = input_size
+        self.confidence = confidence
+        self.max_labels = max_labels
+        self.batcher = MicroBatcher(self._run_batch, max_batch, max_wait_ms / 1000, workers, max_queue)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.warmup_ms: List[float] = []
+        self.pool_restarts = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.labels_path, self.threads_per_worker, self.input_size),
+        )
+
+    async def start(self):
+        """Start the workers, load the model in each and run a warm-up inference"""
+        self._pool = self._new_pool()
+        loop = asyncio.get_running_loop()
+        self.warmup_ms = list(await asyncio.gather(
+            *(loop.run_in_executor(self._pool, warm_up) for _ in range(self.workers))
+        ))
+        self.batcher.start()
+        print(f"🧩 Local detector ready: {os.path.basename(self.model_path)} on {self.workers} workers, warm-up {max(self.warmup_ms)}ms")
+
+    async def _run_batch(self, images: List[bytes]) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            return await loop.run_in_executor(pool, detect_batch, images, self.confidence, self.max_labels)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault) and the executor refuses all further
+            # work, so replace it once and retry this batch on the fresh workers
+            self._restart_pool(pool)
+            return await loop.run_in_executor(self._pool, detect_batch, images, self.confidence, self.max_labels)
+
+    def _restart_pool(self, broken: ProcessPoolExecutor):
+        if self._pool is not broken:
+            return  # a concurrent batch already replaced it
+        print("⚠️  Local detector worker died, restarting the pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._new_pool()
+        self.pool_restarts += 1
+
+    async def detect(self, image_bytes: bytes) -> dict:
+        """Labels for one image, in the same shape as the OpenAI detection"""
+        result = await self.batcher.submit(image_bytes)
+        if "error" in result:
+            raise ValueError(f"Could not decode image: {result['error']}")
+        return {
+            # Same vocabulary as the LLM path ("tv" -> "television", "cell phone" -> "phone")
+            "labels": [canonical_label(label) for label in result["labels"]],
+            "raw_response": f"LOCAL MODEL - {os.path.basename(self.model_path)}",
+            "debug": {
+                "source": "local",
+                "count": len(result["labels"]),
+                "scores": result["scores"],
+                "batch_size": result["batch_size"],
+                "inference_ms": result["inference_ms"],
+            },
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "model": os.path.basename(self.model_path),
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "confidence": self.confidence,
+            "warmup_ms": self.warmup_ms,
+            "pool_restarts": self.pool_restarts,
+            "batcher": self.batcher.snapshot(),
+        }
+
+    async def aclose(self):
+        await self.batcher.aclose()
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def local_detector_from_env(backend: str) -> Optional[LocalDetector]:
+    """The local detector for DETECTION_BACKEND=local / local-then-llm, or None"""
+    if backend not in ("local", "local-then-llm"):
+        return None
+    model_path = os.getenv("DETECTOR_MODEL_PATH", "models/yolov8n.onnx")
+    fallback = "detections will return no labels" if backend == "local" else "using OpenAI only"
+    if ort is None or np is None:
+        print(f"⚠️  DETECTION_BACKEND={backend} needs onnxruntime and numpy (pip install onnxruntime numpy) - {fallback}")
+        return None
+    if not os.path.exists(model_path):
+        print(f"⚠️  Detector model {model_path} not found - {fallback}")
+        return None
+    return LocalDetector(
+        model_path,
+        labels_path=os.getenv("DETECTOR_LABELS_PATH") or None,
+        workers=int(os.getenv("DETECTOR_WORKERS", "1")),
+        threads_per_worker=int(os.getenv("DETECTOR_THREADS", "2")),
+        input_size=int(os.getenv("DETECTOR_INPUT_SIZE", "640")),
+        confidence=float(os.getenv("DETECTOR_CONFIDENCE", "0.25")),
+        max_labels=int(os.getenv("DETECTOR_MAX_LABELS", "30")),
+        max_batch=int(os.getenv("DETECTOR_MAX_BATCH", "8")),
+        max_wait_ms=float(os.getenv("DETECTOR_MAX_WAIT_MS", "10")),
+        max_queue=int(os.getenv("DETECTOR_MAX_QUEUE", "64")),
+    )
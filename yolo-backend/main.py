@@ -1,7 +1,9 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, Depends, Request
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends, Request, Response, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 import io
+import hashlib
 import uvicorn
 import base64
 from pydantic import BaseModel
@@ -11,15 +13,79 @@ import json
 import random
 import uuid
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 import asyncio
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Integer, Boolean
-from sqlalchemy.orm import declarative_base, sessionmaker, Session
-import shutil
+from sqlalchemy import create_engine, Column, String, DateTime, Integer, Boolean, JSON, ForeignKey, Index, update, select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession
 from pathlib import Path
-import re
+from PIL import UnidentifiedImageError
+import tempfile
+import time
+from starlette.datastructures import UploadFile as FormFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from detection_cache import cache_from_env
+from http_client import attempt_timeout, create_openai_client, openai_timeout
+from singleflight import SingleFlight
+from detection_scheduler import DetectionScheduler, SchedulerFull, RETRYABLE_STATUS_CODES, backoff_delay, parse_retry_after
+from local_detector import DETECTION_BACKENDS, local_detector_from_env
+from label_parser import MAX_LABELS, RESPONSE_FORMAT, extract_labels
+from image_preprocess import DECODABLE_EXTENSIONS, PreprocessStats, preprocess_in_pool, render_variants_in_pool
+from schema_migrations import upgrade_schema
+from database import create_async_db_engine, create_session_factory
+from game_cache import cached_game, game_cache_from_env
+from game_ids import GameIdAllocator
+from broadcast import ConnectionManager, backplane_from_env
+from event_log import GameEventLog
+from data_export import EXPORT_FORMATS, EXPORT_TABLES, chunked, export_lines
+from check_duplicates import DUPLICATE_BATCH_GAMES, find_duplicates, remove_duplicates, scan_all_games
+from photo_storage import StoredPhoto, PhotoTooLarge, UnsupportedPhotoType, PhotoNotFound, MAX_PHOTO_BYTES, iter_bytes, store_from_env
 
-app = FastAPI(title="Twovue Game API", version="1.0.0")
+# Pooled client for OpenAI calls, created in the app lifespan
+openai_client: Optional[httpx.AsyncClient] = None
+
+# Worker processes for CPU-bound image work, created in the app lifespan
+image_pool: Optional[ProcessPoolExecutor] = None
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global openai_client, image_pool, local_detector
+    openai_client = create_openai_client()
+    if IMAGE_PROCESS_WORKERS > 0:
+        image_pool = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+    if local_detector:
+        try:
+            await local_detector.start()
+        except Exception as e:
+            fallback = "detections will return no labels" if DETECTION_BACKEND == "local" else "using OpenAI only"
+            print(f"❌ Local detector failed to start, {fallback}: {e}")
+            await local_detector.aclose()
+            local_detector = None
+    await manager.start()
+    try:
+        yield
+    finally:
+        await openai_client.aclose()
+        openai_client = None
+        print("🔌 OpenAI client closed")
+        if image_pool:
+            image_pool.shutdown(wait=False, cancel_futures=True)
+            image_pool = None
+        await photo_store.aclose()
+        if async_engine:
+            await async_engine.dispose()
+        if game_cache:
+            await game_cache.aclose()
+        await manager.aclose()
+        if local_detector:
+            await local_detector.aclose()
+
+app = FastAPI(title="Twovue Game API", version="1.0.0", lifespan=lifespan)
 
 # Allow CORS for mobile app
 app.add_middleware(
@@ -33,6 +99,16 @@ app.add_middleware(
 # Create photos directory for file storage
 PHOTOS_DIR = Path("photos")
 PHOTOS_DIR.mkdir(exist_ok=True)
+photo_store = store_from_env(PHOTOS_DIR)
+
+# Resized copies of photos for list/carousel views, served from /variants
+API_BASE_URL = os.getenv("DOMAIN", "https://twovue-mobile-production.up.railway.app").rstrip("/")
+PHOTO_VARIANT_SIZES = {"thumb": 256, "medium": 768}
+PHOTO_VARIANT_FORMATS = {"jpeg": ("jpg", "image/jpeg"), "webp": ("webp", "image/webp")}
+PHOTO_VARIANT_QUALITY = int(os.getenv("PHOTO_VARIANT_QUALITY", "78"))
+PHOTO_VARIANTS_ON_UPLOAD = os.getenv("PHOTO_VARIANTS_ON_UPLOAD", "true").lower() in ("1", "true", "yes")
+# Stems of derived copies (variants and the detection "_small" image), which never get variants of their own
+DERIVED_KEY_SUFFIXES = tuple(f"_{name}" for name in [*PHOTO_VARIANT_SIZES, "small"])
 
 # Serve static files (photos)
 app.mount("/photos", StaticFiles(directory="photos"), name="photos")
@@ -46,22 +122,26 @@ if DATABASE_URL.startswith("postgres://"):
 
 print(f"📊 Connecting to database: {DATABASE_URL[:50]}...")
 
+Base = declarative_base()
+
 try:
+    # Sync engine for create_all and schema upgrades at startup only
     engine = create_engine(
         DATABASE_URL, 
         connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
         pool_pre_ping=True,  # Verify connections before use
         pool_recycle=300     # Recycle connections every 5 minutes
     )
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base = declarative_base()
+    # Async engine for request handlers so queries don't block the event loop
+    async_engine = create_async_db_engine(DATABASE_URL)
+    SessionLocal = create_session_factory(async_engine)
     print("✅ Database engine created successfully")
 except Exception as e:
     print(f"❌ Database connection error: {e}")
     # Continue anyway for debugging
     engine = None
+    async_engine = None
     SessionLocal = None
-    Base = None
 
 # Database Models
 class DBGame(Base):
@@ -71,26 +151,36 @@ class DBGame(Base):
     player1_name = Column(String, nullable=False)
     player2_name = Column(String, nullable=True)
     status = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_turn_number = Column(Integer, nullable=False, default=0, server_default="0")  # Turn number allocator
+
+# Native JSON column: JSONB on Postgres, JSON text on SQLite
+TagList = JSON().with_variant(JSONB(), "postgresql")
 
 class DBTurn(Base):
     __tablename__ = "turns"
+    __table_args__ = (
+        Index("ux_turns_game_id_turn_number", "game_id", "turn_number", unique=True),
+        Index("ux_turns_game_id_idempotency_key", "game_id", "idempotency_key", unique=True),
+    )
     
     id = Column(String, primary_key=True)
-    game_id = Column(String, nullable=False)
+    game_id = Column(String, ForeignKey("games.id"), nullable=False)
     player_name = Column(String, nullable=False)
     photo_url = Column(String, nullable=False)
-    tags = Column(Text, nullable=False)  # JSON string
+    tags = Column(TagList, nullable=False)
     shared_tag = Column(String, nullable=False)
-    detected_tags = Column(Text, nullable=False)  # JSON string
+    detected_tags = Column(TagList, nullable=False)
     turn_number = Column(Integer, nullable=False)
+    idempotency_key = Column(String, nullable=True)  # Client-supplied, makes retries safe
     created_at = Column(DateTime, default=datetime.utcnow)
 
 # Create tables with error handling
-if engine and Base:
+if engine:
     try:
         Base.metadata.create_all(bind=engine)
+        upgrade_schema(engine)
         print("✅ Database tables created/verified successfully")
     except Exception as e:
         print(f"❌ Database table creation error: {e}")
@@ -98,41 +188,71 @@ if engine and Base:
 else:
     print("⚠️  Skipping table creation due to database connection issues")
 
+# Serialized GET /games/{game_id} responses, invalidated by every write to a game
+game_cache = game_cache_from_env()
+
 # OpenAI API configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+# Ask for {"objects": [...]} JSON instead of prose (see label_parser.py)
+OPENAI_STRUCTURED_OUTPUT = os.getenv("OPENAI_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+# 30 short labels as JSON fit in ~200 tokens; free text needs room for chatter
+OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "250" if OPENAI_STRUCTURED_OUTPUT else "500"))
+
+# Cache of LLM detections keyed on image content
+detection_cache = cache_from_env()
+
+# Caps parallel OpenAI calls; excess requests queue briefly or get a 503
+detection_scheduler = DetectionScheduler(
+    max_concurrency=int(os.getenv("DETECTION_MAX_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("DETECTION_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("DETECTION_QUEUE_TIMEOUT", "20"))
+)
+
+# Where labels come from: openai, local or local-then-llm (see local_detector.py)
+DETECTION_BACKEND = os.getenv("DETECTION_BACKEND", "openai").lower()
+if DETECTION_BACKEND not in DETECTION_BACKENDS:
+    print(f"⚠️  Unknown DETECTION_BACKEND={DETECTION_BACKEND}, using openai")
+    DETECTION_BACKEND = "openai"
+# local-then-llm asks the LLM when the local model finds fewer objects than this
+LOCAL_DETECTION_MIN_LABELS = int(os.getenv("LOCAL_DETECTION_MIN_LABELS", "5"))
+local_detector = local_detector_from_env(DETECTION_BACKEND)
+
+# Downscaling stats for images sent to the LLM
+preprocess_stats = PreprocessStats()
+STORE_DETECTION_IMAGES = os.getenv("STORE_DETECTION_IMAGES", "true").lower() in ("1", "true", "yes")
+
+# Retry policy for 429/5xx responses before falling back to mock labels
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "10"))
 
-# Scientific Game ID Generator (from mobile app)
-SCIENTIFIC_ADJECTIVES = [
-    'quantum', 'atomic', 'neural', 'stellar', 'cosmic', 'optical', 'kinetic', 
-    'thermal', 'magnetic', 'electric', 'photonic', 'sonic', 'crystalline',
-    'molecular', 'orbital', 'plasma', 'gamma', 'alpha', 'beta', 'delta',
-    'micro', 'nano', 'meta', 'ultra', 'hyper', 'neo', 'proto', 'pseudo',
-    'cyber', 'digital', 'analog', 'synthetic', 'organic', 'bionic', 'ionic',
-    'spectral', 'temporal', 'spatial', 'dimensional', 'fractal', 'holographic'
-]
-
-SCIENTIFIC_NOUNS = [
-    'vector', 'matrix', 'prism', 'catalyst', 'reactor', 'generator', 'scanner',
-    'analyzer', 'synthesizer', 'amplifier', 'detector', 'sensor', 'probe',
-    'beacon', 'transmitter', 'receiver', 'oscillator', 'resonator', 'capacitor',
-    'conductor', 'isolator', 'converter', 'processor', 'calculator', 'computer',
-    'algorithm', 'protocol', 'sequence', 'pattern', 'frequency', 'wavelength',
-    'spectrum', 'field', 'chamber', 'module', 'unit', 'device', 'apparatus',
-    'instrument', 'mechanism', 'engine', 'turbine', 'dynamo', 'circuit',
-    'array', 'grid', 'network', 'system', 'core', 'nexus', 'hub', 'node'
-]
-
-SCIENTIFIC_SUFFIXES = [
-    'alpha', 'beta', 'gamma', 'delta', 'omega', 'prime', 'max', 'ultra',
-    'plus', 'neo', 'pro', 'x', 'z', 'one', 'two', 'three', 'seven', 'nine'
-]
-
-def generate_scientific_game_id() -> str:
-    """Generate a whimsical scientific game ID like 'quantum-vector-alpha'"""
-    adjective = random.choice(SCIENTIFIC_ADJECTIVES)
-    noun = random.choice(SCIENTIFIC_NOUNS)
-    suffix = random.choice(SCIENTIFIC_SUFFIXES)
-    return f"{adjective}-{noun}-{suffix}"
+# Slack for preprocessing the image inside the flight, before it queues
+DETECTION_PREPROCESS_SECONDS = 10.0
+
+def detection_budget() -> float:
+    """Worst case for one detection: the queue wait, every attempt timing out and every backoff"""
+    attempts = OPENAI_MAX_RETRIES + 1
+    return (
+        DETECTION_PREPROCESS_SECONDS
+        + detection_scheduler.queue_timeout
+        + attempts * attempt_timeout(openai_timeout())
+        + OPENAI_MAX_RETRIES * OPENAI_RETRY_MAX_DELAY
+    )
+
+# Coalesces concurrent detections of the same image into one OpenAI call. The
+# shared call is only cut off once the queue wait and all retries are exhausted
+DETECTION_BUDGET = detection_budget()
+DETECTION_FLIGHT_TIMEOUT = float(os.getenv("DETECTION_FLIGHT_TIMEOUT") or DETECTION_BUDGET)
+if DETECTION_FLIGHT_TIMEOUT < DETECTION_BUDGET:
+    print(f"⚠️  DETECTION_FLIGHT_TIMEOUT={DETECTION_FLIGHT_TIMEOUT}s is below the {DETECTION_BUDGET:.0f}s retry budget; late retries will be cut off")
+detection_flights = SingleFlight(timeout=DETECTION_FLIGHT_TIMEOUT)
+
+# Game IDs are allocated by insert-and-retry, widening the ID space as it fills
+game_id_allocator = GameIdAllocator(
+    max_attempts=int(os.getenv("GAME_ID_MAX_ATTEMPTS", "8")),
+    target_load=float(os.getenv("GAME_ID_TARGET_LOAD", "0.1")),
+    recount_every=int(os.getenv("GAME_ID_RECOUNT_EVERY", "1000"))
+)
 
 # Pydantic Models
 class ImageData(BaseModel):
@@ -141,6 +261,10 @@ class ImageData(BaseModel):
 class CreateGameRequest(BaseModel):
     player1_name: str
 
+class BatchGamesRequest(BaseModel):
+    game_ids: List[str]
+    summary: bool = False
+
 class JoinGameRequest(BaseModel):
     player2_name: str
 
@@ -161,72 +285,82 @@ class GameResponse(BaseModel):
     turns: List[dict]
 
 # Database dependency with error handling
-def get_db():
+async def get_db():
     if not SessionLocal:
         raise HTTPException(status_code=503, detail="Database not available")
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-# WebSocket Connection Manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
-    
-    async def connect(self, websocket: WebSocket, game_id: str):
-        await websocket.accept()
-        if game_id not in self.active_connections:
-            self.active_connections[game_id] = []
-        self.active_connections[game_id].append(websocket)
-        print(f"WebSocket connected to game {game_id}. Total connections: {len(self.active_connections[game_id])}")
-    
-    def disconnect(self, websocket: WebSocket, game_id: str):
-        if game_id in self.active_connections:
-            self.active_connections[game_id].remove(websocket)
-            if not self.active_connections[game_id]:
-                del self.active_connections[game_id]
-    
-    async def broadcast_to_game(self, game_id: str, message: dict):
-        if game_id in self.active_connections:
-            dead_connections = []
-            for connection in self.active_connections[game_id]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except:
-                    dead_connections.append(connection)
-            
-            # Remove dead connections
-            for connection in dead_connections:
-                self.active_connections[game_id].remove(connection)
 
-manager = ConnectionManager()
+# WebSocket connections; broadcasts reach other workers' sockets through the backplane
+manager = ConnectionManager(
+    backplane_from_env(DATABASE_URL),
+    queue_size=int(os.getenv("WS_SEND_QUEUE", "64")),
+    send_timeout=float(os.getenv("WS_SEND_TIMEOUT", "10")),
+    ping_interval=float(os.getenv("WS_PING_INTERVAL", "25")),
+    idle_timeout=float(os.getenv("WS_IDLE_TIMEOUT", "60")),
+    events=GameEventLog(
+        max_events=int(os.getenv("EVENT_LOG_SIZE", "100")),
+        max_games=int(os.getenv("EVENT_LOG_GAMES", "1024"))
+    )
+)
 
 # Helper Functions
-def db_game_to_response(db_game: DBGame, db_turns: List[DBTurn]) -> dict:
+def has_variants(key: str) -> bool:
+    """Whether key is an original upload in a format Pillow can decode"""
+    stem, _, extension = key.rpartition(".")
+    return bool(stem) and not stem.endswith(DERIVED_KEY_SUFFIXES) and extension.lower() in DECODABLE_EXTENSIONS
+
+def photo_variant_urls(photo_url: str) -> Optional[dict]:
+    """Variant URLs for a photo stored by this server, None for anything else"""
+    prefix = photo_store.base_url + "/"
+    if not photo_url.startswith(prefix):
+        return None
+    key = photo_url[len(prefix):]
+    if not has_variants(key):
+        return None
+    return {size: f"{API_BASE_URL}/variants/{key}?size={size}" for size in PHOTO_VARIANT_SIZES}
+
+def db_turn_to_response(turn: DBTurn) -> dict:
+    return {
+        "id": turn.id,
+        "gameId": turn.game_id,
+        "playerName": turn.player_name,
+        "photoUrl": turn.photo_url,
+        "photoVariants": photo_variant_urls(turn.photo_url),
+        "tags": turn.tags,
+        "sharedTag": turn.shared_tag,
+        "detectedTags": turn.detected_tags,
+        "turnNumber": turn.turn_number,
+        "createdAt": turn.created_at.isoformat()
+    }
+
+def db_game_fields(db_game: DBGame) -> dict:
     return {
         "id": db_game.id,
         "player1Name": db_game.player1_name,
         "player2Name": db_game.player2_name,
         "status": db_game.status,
         "createdAt": db_game.created_at.isoformat(),
-        "updatedAt": db_game.updated_at.isoformat(),
-        "turns": [
-            {
-                "id": turn.id,
-                "gameId": turn.game_id,
-                "playerName": turn.player_name,
-                "photoUrl": turn.photo_url,
-                "tags": json.loads(turn.tags),
-                "sharedTag": turn.shared_tag,
-                "detectedTags": json.loads(turn.detected_tags),
-                "turnNumber": turn.turn_number,
-                "createdAt": turn.created_at.isoformat()
-            } for turn in sorted(db_turns, key=lambda x: x.turn_number)
-        ]
+        "updatedAt": db_game.updated_at.isoformat()
     }
 
+def db_game_to_response(db_game: DBGame, db_turns: List[DBTurn]) -> dict:
+    return {
+        **db_game_fields(db_game),
+        "turns": [db_turn_to_response(turn) for turn in sorted(db_turns, key=lambda x: x.turn_number)]
+    }
+
+def db_game_summary(db_game: DBGame, turn_count: int) -> dict:
+    """A game without its turn list, for dashboards"""
+    return {**db_game_fields(db_game), "turnCount": turn_count}
+
+def etag_matches(request: Request, etag: str) -> bool:
+    return etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+
+async def invalidate_game(game_id: str):
+    if game_cache:
+        await game_cache.invalidate(game_id)
+
 # Add request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -249,37 +383,124 @@ async def root():
 
 # Game Management Endpoints
 @app.post("/games")
-async def create_game(request: CreateGameRequest, db: Session = Depends(get_db)):
+async def create_game(request: CreateGameRequest, db: AsyncSession = Depends(get_db)):
     """Create a new game"""
-    game_id = generate_scientific_game_id()
-    
-    db_game = DBGame(
-        id=game_id,
-        player1_name=request.player1_name,
-        status="WAITING_FOR_PLAYER2"
-    )
+    if game_id_allocator.needs_recount():
+        game_id_allocator.recounted(await db.scalar(select(func.count()).select_from(DBGame)))
     
-    db.add(db_game)
-    db.commit()
+    # The primary key is the arbiter: insert, and on a clash try another id
+    for attempt in range(game_id_allocator.max_attempts):
+        game_id = game_id_allocator.candidate(attempt)
+        db.add(DBGame(
+            id=game_id,
+            player1_name=request.player1_name,
+            status="WAITING_FOR_PLAYER2"
+        ))
+        try:
+            await db.commit()
+            break
+        except IntegrityError:
+            await db.rollback()
+            game_id_allocator.collided()
+            print(f"♻️  Game ID {game_id} already taken, retrying")
+    else:
+        raise HTTPException(status_code=503, detail="Could not allocate a game ID, please retry")
+    game_id_allocator.allocated()
     
     print(f"Created game {game_id} for player {request.player1_name}")
     return {"game_id": game_id}
 
-@app.get("/games/{game_id}")
-async def get_game(game_id: str, db: Session = Depends(get_db)):
-    """Get game by ID"""
-    db_game = db.query(DBGame).filter(DBGame.id == game_id).first()
+async def load_game(db: AsyncSession, game_id: str) -> dict:
+    db_game = await db.get(DBGame, game_id)
     if not db_game:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    db_turns = db.query(DBTurn).filter(DBTurn.game_id == game_id).all()
+    db_turns = (await db.scalars(
+        select(DBTurn).where(DBTurn.game_id == game_id).order_by(DBTurn.turn_number)
+    )).all()
     
     return db_game_to_response(db_game, db_turns)
 
+@app.get("/games/{game_id}")
+async def get_game(game_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Get game by ID. Served from game_cache, with If-None-Match answered by 304"""
+    cached = await game_cache.get(game_id) if game_cache else None
+    if cached is None:
+        generation = await game_cache.generation(game_id) if game_cache else 0
+        cached = cached_game(json.dumps(await load_game(db, game_id)).encode("utf-8"))
+        if game_cache:
+            await game_cache.set(game_id, cached, generation)
+    
+    # no-cache: clients may keep the body but must revalidate before reusing it
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+BATCH_GAMES_MAX = 100
+
+@app.post("/games/batch")
+async def get_games_batch(request: BatchGamesRequest, db: AsyncSession = Depends(get_db)):
+    """Several games in two IN queries. Unknown ids are listed under "missing".
+    With summary=true each game has a turnCount instead of its turns."""
+    game_ids = list(dict.fromkeys(request.game_ids))
+    if len(game_ids) > BATCH_GAMES_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_GAMES_MAX} games per request")
+    if not game_ids:
+        return {"games": [], "missing": []}
+    
+    db_games = {game.id: game for game in (await db.scalars(
+        select(DBGame).where(DBGame.id.in_(game_ids))
+    )).all()}
+    found_ids = [game_id for game_id in game_ids if game_id in db_games]
+    
+    if request.summary:
+        counts = dict((await db.execute(
+            select(DBTurn.game_id, func.count()).where(DBTurn.game_id.in_(found_ids)).group_by(DBTurn.game_id)
+        )).all()) if found_ids else {}
+        games = [db_game_summary(db_games[game_id], counts.get(game_id, 0)) for game_id in found_ids]
+    else:
+        turns_by_game: Dict[str, List[DBTurn]] = {game_id: [] for game_id in found_ids}
+        if found_ids:
+            for turn in (await db.scalars(
+                select(DBTurn).where(DBTurn.game_id.in_(found_ids)).order_by(DBTurn.game_id, DBTurn.turn_number)
+            )).all():
+                turns_by_game[turn.game_id].append(turn)
+        games = [db_game_to_response(db_games[game_id], turns_by_game[game_id]) for game_id in found_ids]
+    
+    return {"games": games, "missing": [game_id for game_id in game_ids if game_id not in db_games]}
+
+TURNS_PAGE_MAX = 200
+
+@app.get("/games/{game_id}/turns")
+async def get_turns(game_id: str, after: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=TURNS_PAGE_MAX), db: AsyncSession = Depends(get_db)):
+    """Turns with turn_number > after, oldest first. Pass next_after back to continue"""
+    db_game = await db.get(DBGame, game_id)
+    if not db_game:
+        raise HTTPException(status_code=404, detail="Game not found")
+    
+    # Range scan on the unique (game_id, turn_number) index
+    db_turns = (await db.scalars(
+        select(DBTurn)
+        .where(DBTurn.game_id == game_id, DBTurn.turn_number > after)
+        .order_by(DBTurn.turn_number)
+        .limit(limit + 1)
+    )).all()
+    has_more = len(db_turns) > limit
+    db_turns = db_turns[:limit]
+    
+    return {
+        "game_id": game_id,
+        "turns": [db_turn_to_response(turn) for turn in db_turns],
+        "next_after": db_turns[-1].turn_number if db_turns else after,
+        "has_more": has_more,
+        "last_turn_number": db_game.last_turn_number
+    }
+
 @app.post("/games/{game_id}/join")
-async def join_game(game_id: str, request: JoinGameRequest, db: Session = Depends(get_db)):
+async def join_game(game_id: str, request: JoinGameRequest, db: AsyncSession = Depends(get_db)):
     """Join an existing game"""
-    db_game = db.query(DBGame).filter(DBGame.id == game_id).first()
+    db_game = await db.get(DBGame, game_id)
     if not db_game:
         raise HTTPException(status_code=404, detail="Game not found")
     
@@ -290,7 +511,8 @@ async def join_game(game_id: str, request: JoinGameRequest, db: Session = Depend
     db_game.status = "IN_PROGRESS"
     db_game.updated_at = datetime.utcnow()
     
-    db.commit()
+    await db.commit()
+    await invalidate_game(game_id)
     
     print(f"Player {request.player2_name} joined game {game_id}")
     
@@ -303,16 +525,45 @@ async def join_game(game_id: str, request: JoinGameRequest, db: Session = Depend
     
     return {"message": "Successfully joined game"}
 
+async def find_turn_by_idempotency_key(db: AsyncSession, game_id: str, idempotency_key: str) -> Optional[DBTurn]:
+    return await db.scalar(select(DBTurn).where(
+        DBTurn.game_id == game_id,
+        DBTurn.idempotency_key == idempotency_key
+    ))
+
+def turn_submitted_response(db_turn: DBTurn, replayed: bool = False) -> dict:
+    return {
+        "message": "Turn submitted successfully",
+        "turn_id": db_turn.id,
+        "turn_number": db_turn.turn_number,
+        "replayed": replayed
+    }
+
 @app.post("/games/{game_id}/turns")
-async def submit_turn(game_id: str, request: SubmitTurnRequest, db: Session = Depends(get_db)):
-    """Submit a turn"""
-    db_game = db.query(DBGame).filter(DBGame.id == game_id).first()
-    if not db_game:
-        raise HTTPException(status_code=404, detail="Game not found")
+async def submit_turn(
+    game_id: str,
+    request: SubmitTurnRequest,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=128)
+):
+    """Submit a turn. Retries carrying the same Idempotency-Key return the original turn"""
+    if idempotency_key:
+        existing = await find_turn_by_idempotency_key(db, game_id, idempotency_key)
+        if existing:
+            print(f"↩️  Replaying turn {existing.turn_number} for idempotency key {idempotency_key}")
+            return turn_submitted_response(existing, replayed=True)
     
-    # Get current turn number
-    existing_turns = db.query(DBTurn).filter(DBTurn.game_id == game_id).count()
-    turn_number = existing_turns + 1
+    # Allocate the turn number and touch the game in one statement. The row lock
+    # taken by the UPDATE serializes concurrent submits for the same game.
+    turn_number = (await db.execute(
+        update(DBGame)
+        .where(DBGame.id == game_id)
+        .values(last_turn_number=DBGame.last_turn_number + 1, updated_at=datetime.utcnow())
+        .returning(DBGame.last_turn_number)
+    )).scalar_one_or_none()
+    if turn_number is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Game not found")
     
     # Create new turn
     db_turn = DBTurn(
@@ -320,17 +571,26 @@ async def submit_turn(game_id: str, request: SubmitTurnRequest, db: Session = De
         game_id=game_id,
         player_name=request.player_name,
         photo_url=request.photo_url,
-        tags=json.dumps(request.tags),
+        tags=request.tags,
         shared_tag=request.shared_tag,
-        detected_tags=json.dumps(request.detected_tags),
-        turn_number=turn_number
+        detected_tags=request.detected_tags,
+        turn_number=turn_number,
+        idempotency_key=idempotency_key
     )
     
     db.add(db_turn)
-    
-    # Update game
-    db_game.updated_at = datetime.utcnow()
-    db.commit()
+    # Built before commit so reading the turn back doesn't cost another query
+    response = turn_submitted_response(db_turn)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key won the race
+        await db.rollback()
+        existing = await find_turn_by_idempotency_key(db, game_id, idempotency_key) if idempotency_key else None
+        if existing:
+            return turn_submitted_response(existing, replayed=True)
+        raise HTTPException(status_code=409, detail="Turn could not be recorded, please retry")
+    await invalidate_game(game_id)
     
     print(f"Turn {turn_number} submitted for game {game_id} by {request.player_name}")
     
@@ -339,38 +599,261 @@ async def submit_turn(game_id: str, request: SubmitTurnRequest, db: Session = De
         "type": "turn_submitted",
         "player_name": request.player_name,
         "turn_number": turn_number,
+        "turn": db_turn_to_response(db_turn),
         "message": f"{request.player_name} submitted turn {turn_number}!"
     })
     
-    return {"message": "Turn submitted successfully"}
+    return response
+
+async def store_photo(chunks) -> StoredPhoto:
+    """Save a photo through photo_store, mapping storage errors to HTTP errors"""
+    try:
+        stored = await photo_store.save_stream(chunks)
+    except PhotoTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedPhotoType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    if stored.deduplicated:
+        print(f"♻️  Photo {stored.key} already stored, reusing it")
+    return stored
 
 # File Upload Endpoint
 @app.post("/upload-photo")
-async def upload_photo(file: UploadFile = File(...)):
-    """Upload a photo and return the URL"""
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-    filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = PHOTOS_DIR / filename
+async def upload_photo(request: Request):
+    """Upload a photo (multipart field "file" or a raw body) and return the URL"""
+    # Capped while the body streams in, like /detect and /upload-and-detect
+    image_bytes = await read_request_image(request)
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    stored = await store_photo(iter_bytes(image_bytes))
+    photo_url = photo_store.url_for(stored.key)
     
-    # Return URL - hardcode the correct Railway domain
-    photo_url = f"https://twovue-mobile-production.up.railway.app/photos/{filename}"
+    print(f"Uploaded photo: {photo_url} ({stored.size} bytes)")
     
-    print(f"Uploaded photo: {photo_url}")
+    if PHOTO_VARIANTS_ON_UPLOAD and not stored.deduplicated and has_variants(stored.key):
+        spawn_background(generate_variants(stored.key))
     return {"photo_url": photo_url}
 
-# Object Detection Endpoint (LLM-only)
-@app.post("/detect-llm")
-async def detect_llm(data: ImageData):
-    """Use LLM (GPT-4 Vision) to detect objects in the image"""
+async def post_with_retries(path: str, headers: dict, payload: dict) -> httpx.Response:
+    """POST to OpenAI, retrying 429/5xx and transport errors with jittered backoff"""
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        last_attempt = attempt == OPENAI_MAX_RETRIES
+        try:
+            response = await openai_client.post(path, headers=headers, json=payload)
+        except httpx.TransportError as e:
+            if last_attempt:
+                raise
+            delay = backoff_delay(attempt, OPENAI_RETRY_BASE_DELAY, OPENAI_RETRY_MAX_DELAY)
+            print(f"⚠️  OpenAI transport error ({e!r}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        
+        if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+            return response
+        
+        delay = backoff_delay(
+            attempt, OPENAI_RETRY_BASE_DELAY, OPENAI_RETRY_MAX_DELAY,
+            retry_after=parse_retry_after(response.headers)
+        )
+        print(f"⚠️  OpenAI returned {response.status_code}, retrying in {delay:.2f}s (attempt {attempt + 1}/{OPENAI_MAX_RETRIES})")
+        await asyncio.sleep(delay)
+
+async def prepare_detection_image(image_bytes: bytes, digest: str) -> dict:
+    """Downscale an image for the LLM, keeping the original on failure"""
+    try:
+        prepared = await preprocess_in_pool(image_pool, image_bytes)
+    except Exception as e:
+        print(f"⚠️  Image preprocessing failed, sending original: {e}")
+        preprocess_stats.failures += 1
+        return {"image": image_bytes, "detail": "auto", "debug": {"error": str(e)}}
+    
+    preprocess_stats.record(prepared)
+    print(f"🖼️  Preprocessed {prepared['original_width']}x{prepared['original_height']} -> "
+          f"{prepared['width']}x{prepared['height']}, {prepared['original_bytes']} -> {prepared['processed_bytes']} bytes "
+          f"in {prepared['elapsed_ms']}ms")
+    
+    if STORE_DETECTION_IMAGES:
+        try:
+            await asyncio.gather(
+                photo_store.save_bytes(image_bytes),
+                photo_store.put(photo_store.key_for(digest, "jpg", "_small"), prepared["image"], "image/jpeg")
+            )
+        except Exception as e:
+            print(f"⚠️  Could not store detection images: {e}")
+    
+    return {
+        "image": prepared["image"],
+        "detail": prepared["detail"],
+        "debug": {
+            "bytes_saved": prepared["original_bytes"] - prepared["processed_bytes"],
+            "elapsed_ms": prepared["elapsed_ms"],
+            "size": f"{prepared['width']}x{prepared['height']}",
+            "detail": prepared["detail"]
+        }
+    }
+
+LABEL_PROMPT_TEXT = (
+    "Analyze this image and list objects that would be good for a photo scavenger hunt game. "
+    "Return a comma-separated list of specific, recognizable objects (not abstract concepts). "
+    "Focus on tangible items like furniture, electronics, household items, etc. "
+    f"Limit to {MAX_LABELS} most prominent objects."
+)
+LABEL_PROMPT_JSON = (
+    "List objects in this image that would be good for a photo scavenger hunt game: "
+    "specific, tangible, recognizable items like furniture, electronics and household items, "
+    f"not abstract concepts. Use short singular names, at most {MAX_LABELS}, most prominent first."
+)
+
+async def detect_with_openai(image_base64: str, detail: str = "auto") -> dict:
+    """Send one image to GPT-4o and parse the labels out of its reply"""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {OPENAI_API_KEY}"
+    }
+    
+    print(f"🔑 API Key length: {len(OPENAI_API_KEY)}")
+    print(f"🔑 API Key starts with: {OPENAI_API_KEY[:10]}...")
+    print(f"🔑 Authorization header length: {len(headers['Authorization'])}")
+    
+    payload = {
+        "model": "gpt-4o",  # Using GPT-4o which supports vision
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": LABEL_PROMPT_JSON if OPENAI_STRUCTURED_OUTPUT else LABEL_PROMPT_TEXT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{image_base64}",
+                            "detail": detail
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": OPENAI_MAX_TOKENS
+    }
+    if OPENAI_STRUCTURED_OUTPUT:
+        payload["response_format"] = RESPONSE_FORMAT
+    
+    response = await post_with_retries("/chat/completions", headers, payload)
+    
+    print(f"OpenAI API Response Status: {response.status_code}")
+    print(f"OpenAI API Response Headers: {dict(response.headers)}")
+    
+    if response.status_code == 200:
+        result = response.json()
+        message = result['choices'][0]['message']
+        # A refusal comes back with content null and no labels
+        raw_content = message.get('content') or ""
+        if message.get('refusal'):
+            print(f"⚠️  OpenAI refused: {message['refusal']}")
+        
+        # JSON replies are read directly; anything else goes through the free-text parser
+        labels, raw_count, reply_format = extract_labels(raw_content, MAX_LABELS)
+        
+        print(f"LLM detected {len(labels)} objects after cleaning ({reply_format} reply)")
+        print(f"Raw content: {raw_content[:100]}...")
+        print(f"Cleaned objects: {labels[:10]}...")
+        
+        detection = {
+            "labels": labels,
+            "raw_response": raw_content,
+            "debug": {
+                "source": "openai",
+                "format": reply_format,
+                "original_count": raw_count,
+                "cleaned_count": len(labels),
+                "completion_tokens": result.get("usage", {}).get("completion_tokens")
+            }
+        }
+        
+        return detection
+    else:
+        # Fallback to mock data on API errors
+        print(f"OpenAI API error: {response.status_code}")
+        
+        # Log the error response body for debugging
+        try:
+            error_body = response.json()
+            print(f"OpenAI Error Response: {error_body}")
+        except:
+            error_text = response.text
+            print(f"OpenAI Error Text: {error_text}")
+        
+        base_objects = [
+            "person", "chair", "table", "laptop", "phone", "cup", 
+            "book", "pen", "window", "door", "floor", "wall",
+            "light", "picture frame", "plant", "bag", "bottle", "keyboard",
+            "monitor", "mouse", "desk", "lamp", "ceiling", "carpet"
+        ]
+        
+        num_objects = random.randint(15, 25)
+        selected_objects = random.sample(base_objects, min(num_objects, len(base_objects)))
+        
+        return {
+            "labels": selected_objects,
+            "raw_response": f"API Error {response.status_code}",
+            "debug": {
+                "source": "mock_fallback",
+                "count": len(selected_objects),
+                "error_code": response.status_code
+            }
+        }
+
+async def detect_locally(image_bytes: bytes) -> dict:
+    """Labels from the local model. Raises if it isn't running or the image can't be processed"""
+    if not local_detector:
+        raise RuntimeError("local detector is not running")
+    return await local_detector.detect(image_bytes)
+
+def with_local_labels(local: dict, reason: str) -> dict:
+    """The local model's result, returned when the LLM it deferred to couldn't answer"""
+    print(f"🧩 LLM unavailable ({reason}), keeping the {len(local['labels'])} local labels")
+    return {**local, "debug": {**local["debug"], "llm_fallback": reason}}
+
+def local_detection_failed(error: str) -> dict:
+    """Empty result for DETECTION_BACKEND=local, which never falls back to the paid LLM"""
+    return {
+        "labels": [],
+        "raw_response": f"LOCAL MODEL ERROR - {error}",
+        "debug": {
+            "source": "local_error",
+            "error": error
+        }
+    }
+
+async def run_detection(image_bytes: bytes) -> dict:
+    """Detect objects in raw image bytes (local model, cache, coalescing, preprocessing and OpenAI)"""
+    # Too few local labels to stand alone, but real ones; kept if the LLM can't do better
+    local_result = None
     try:
+        if local_detector or DETECTION_BACKEND == "local":
+            try:
+                detection = await detect_locally(image_bytes)
+            except SchedulerFull:
+                raise
+            except Exception as e:
+                print(f"⚠️  Local detection failed: {e}")
+                if DETECTION_BACKEND == "local":
+                    return local_detection_failed(str(e))
+                detection = None
+            if detection is not None:
+                if DETECTION_BACKEND == "local" or len(detection["labels"]) >= LOCAL_DETECTION_MIN_LABELS:
+                    return detection
+                print(f"🧩 Local model found {len(detection['labels'])} objects, asking the LLM")
+                local_result = detection
+        
         # Check if we have a valid-looking OpenAI API key
         use_mock = not OPENAI_API_KEY or OPENAI_API_KEY == "mock-key-for-testing" or not OPENAI_API_KEY.startswith("sk-")
         
+        if use_mock and local_result is not None:
+            return with_local_labels(local_result, "mock")
+        
         if use_mock:
             # If no OpenAI key, fall back to a mock response for testing
             print("Using mock LLM response (no valid OpenAI API key)")
@@ -408,159 +891,300 @@ async def detect_llm(data: ImageData):
                 }
             }
         
-        # Prepare the image for GPT-4 Vision
-        image_base64 = data.image
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {OPENAI_API_KEY}"
-        }
+        # Check the detection cache before paying for another LLM call
+        cache_key = await detection_cache.akeys_for(image_bytes)
+        cached = await detection_cache.aget(*cache_key)
+        if cached is not None:
+            print(f"⚡ Detection cache hit for {cache_key[0][:12]}")
+            return {**cached, "debug": {**cached["debug"], "cache": "hit"}}
         
-        print(f"🔑 API Key length: {len(OPENAI_API_KEY)}")
-        print(f"🔑 API Key starts with: {OPENAI_API_KEY[:10]}...")
-        print(f"🔑 Authorization header length: {len(headers['Authorization'])}")
+        async def scheduled_detection():
+            # Admit (or 503) first, then shrink the image before taking an upstream slot,
+            # so rejected requests never pay for preprocessing or storage
+            async with detection_scheduler.admission():
+                prepared = await prepare_detection_image(image_bytes, cache_key[0])
+                prepared_base64 = base64.b64encode(prepared["image"]).decode("ascii")
+                detection = await detection_scheduler.run_admitted(
+                    lambda: detect_with_openai(prepared_base64, prepared["detail"])
+                )
+            return {**detection, "debug": {**detection["debug"], "preprocess": prepared["debug"]}}
         
-        # Improved prompt for better results
-        payload = {
-            "model": "gpt-4o",  # Using GPT-4o which supports vision
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Analyze this image and list objects that would be good for a photo scavenger hunt game. Return a comma-separated list of specific, recognizable objects (not abstract concepts). Focus on tangible items like furniture, electronics, household items, etc. Limit to 30 most prominent objects."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 500
-        }
+        # Identical images in flight at the same time share one upstream call
+        detection, shared = await detection_flights.do(cache_key[0], scheduled_detection)
+        if local_result is not None and detection["debug"].get("source") != "openai":
+            return with_local_labels(local_result, detection["debug"].get("source", "unknown"))
+        if shared:
+            print(f"🔗 Coalesced detection for {cache_key[0][:12]}")
+            return {**detection, "debug": {**detection["debug"], "coalesced": True}}
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
-            
-        print(f"OpenAI API Response Status: {response.status_code}")
-        print(f"OpenAI API Response Headers: {dict(response.headers)}")
+        if detection["debug"].get("source") == "openai":
+            await detection_cache.aput(cache_key[0], detection, cache_key[1])
+        return detection
         
-        if response.status_code == 200:
-            result = response.json()
-            raw_content = result['choices'][0]['message']['content']
-            
-            # Improved parsing to extract only object names
-            # Handle different response formats from the LLM
-            content_lower = raw_content.lower()
-            
-            # Look for common list indicators and extract the list portion
-            if ":" in raw_content and any(indicator in content_lower for indicator in ["objects", "items", "list"]):
-                # Split on colons and take the part after the first colon
-                parts = raw_content.split(":", 1)
-                if len(parts) > 1:
-                    list_part = parts[1]
-                else:
-                    list_part = raw_content
-            else:
-                list_part = raw_content
-            
-            # Clean up and parse objects
-            # Remove common conversational phrases
-            unwanted_phrases = [
-                "sure", "here's", "here are", "i can see", "i see", "the image shows",
-                "in the image", "from the image", "i can identify", "objects include",
-                "here's a list", "here are the", "list of objects", "detected objects"
-            ]
-            
-            # Split by common delimiters
-            if "," in list_part:
-                objects = [obj.strip() for obj in list_part.split(",")]
-            elif "\n" in list_part:
-                objects = [obj.strip() for obj in list_part.split("\n")]
-            else:
-                # Single object or space-separated
-                objects = [obj.strip() for obj in list_part.split()]
-            
-            # Clean each object
-            cleaned_objects = []
-            for obj in objects:
-                # Remove numbers, bullets, dashes from start
-                obj = re.sub(r'^[\d\.\-\*\•\s]+', '', obj)
-                # Remove common prefixes
-                for phrase in unwanted_phrases:
-                    if phrase in obj.lower():
-                        obj = re.sub(re.escape(phrase), '', obj, flags=re.IGNORECASE)
-                
-                obj = obj.strip().strip('.,!?;:"()[]{}').lower()
-                
-                # Filter out invalid entries
-                if (len(obj) > 2 and 
-                    obj not in ['the', 'and', 'or', 'a', 'an', 'is', 'are', 'it', 'this', 'that'] and
-                    not obj.startswith('http') and
-                    not any(phrase in obj for phrase in unwanted_phrases)):
-                    cleaned_objects.append(obj)
-            
-            # Remove duplicates while preserving order
-            labels = list(dict.fromkeys(cleaned_objects))
-            
-            print(f"LLM detected {len(labels)} objects after cleaning")
-            print(f"Raw content: {raw_content[:100]}...")
-            print(f"Cleaned objects: {labels[:10]}...")
-            
-            return {
-                "labels": labels[:30],
-                "raw_response": raw_content,
-                "debug": {
-                    "source": "openai",
-                    "original_count": len(objects),
-                    "cleaned_count": len(labels)
-                }
-            }
-        else:
-            # Fallback to mock data on API errors
-            print(f"OpenAI API error: {response.status_code}")
-            
-            # Log the error response body for debugging
-            try:
-                error_body = response.json()
-                print(f"OpenAI Error Response: {error_body}")
-            except:
-                error_text = response.text
-                print(f"OpenAI Error Text: {error_text}")
-            
-            base_objects = [
-                "person", "chair", "table", "laptop", "phone", "cup", 
-                "book", "pen", "window", "door", "floor", "wall",
-                "light", "picture frame", "plant", "bag", "bottle", "keyboard",
-                "monitor", "mouse", "desk", "lamp", "ceiling", "carpet"
-            ]
-            
-            num_objects = random.randint(15, 25)
-            selected_objects = random.sample(base_objects, min(num_objects, len(base_objects)))
-            
-            return {
-                "labels": selected_objects,
-                "raw_response": f"API Error {response.status_code}",
-                "debug": {
-                    "source": "mock_fallback",
-                    "count": len(selected_objects),
-                    "error_code": response.status_code
-                }
-            }
-            
+    except SchedulerFull as e:
+        if local_result is not None:
+            return with_local_labels(local_result, "busy")
+        print(f"🚦 Detection queue full, asking client to retry in {e.retry_after}s")
+        raise HTTPException(
+            status_code=503,
+            detail="Detection service is busy, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except asyncio.TimeoutError:
+        print(f"⏱️  Detection timed out after {DETECTION_FLIGHT_TIMEOUT:g}s")
+        if local_result is not None:
+            return with_local_labels(local_result, "timeout")
+        return {"error": f"Detection timed out after {DETECTION_FLIGHT_TIMEOUT:g}s", "labels": []}
     except Exception as e:
         print(f"Error in detect_llm: {str(e)}")
+        if local_result is not None:
+            return with_local_labels(local_result, "error")
         return {"error": str(e), "labels": []}
 
+# Object Detection Endpoint (LLM-only)
+@app.post("/detect-llm")
+async def detect_llm(data: ImageData):
+    """Use LLM (GPT-4 Vision) to detect objects in the image"""
+    try:
+        image_bytes = base64.b64decode(data.image)
+    except Exception as e:
+        print(f"⚠️  Could not decode base64 image: {e}")
+        return {"error": f"Invalid base64 image: {e}", "labels": []}
+    
+    return await run_detection(image_bytes)
+
+# How much of a raw image body stays in memory before spilling to a temp file
+SPOOL_MEMORY_BYTES = 1024 * 1024
+# Room for the multipart boundary and part headers around the image itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class RequestTooLarge(MultiPartException):
+    """Raised from inside multipart parsing, so Starlette closes the parts it spooled"""
+
+async def limited_stream(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """The request body, cut off with RequestTooLarge once it passes limit bytes"""
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise RequestTooLarge(f"Request body exceeds {limit} bytes")
+        yield chunk
+
+async def read_request_image(request: Request) -> bytes:
+    """Read an image from a multipart form (field "file") or a raw request body"""
+    content_type = request.headers.get("content-type", "")
+    multipart = content_type.startswith("multipart/form-data")
+    limit = MAX_PHOTO_BYTES + (MULTIPART_OVERHEAD_BYTES if multipart else 0)
+    
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    
+    if multipart:
+        # Parse the form ourselves so the size cap applies while the part is
+        # being spooled, not after Starlette has written all of it to disk
+        parser = MultiPartParser(request.headers, limited_stream(request, limit), max_files=1, max_fields=16)
+        try:
+            form = await parser.parse()
+        except RequestTooLarge:
+            raise HTTPException(status_code=413, detail="Image is too large")
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+        try:
+            upload = form.get("file")
+            if not isinstance(upload, FormFile):
+                raise HTTPException(status_code=400, detail="Expected an image in the 'file' field")
+            if upload.size is not None and upload.size > MAX_PHOTO_BYTES:
+                raise HTTPException(status_code=413, detail="Image is too large")
+            image_bytes = await upload.read()
+        finally:
+            await form.close()
+    else:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+            size = 0
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > MAX_PHOTO_BYTES:
+                    raise HTTPException(status_code=413, detail="Image is too large")
+                # Past max_size the spool is (or is about to roll over to) a real file
+                if size > SPOOL_MEMORY_BYTES:
+                    await asyncio.to_thread(spool.write, chunk)
+                else:
+                    spool.write(chunk)
+            spool.seek(0)
+            image_bytes = await asyncio.to_thread(spool.read) if size > SPOOL_MEMORY_BYTES else spool.read()
+    
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="No image data received")
+    return image_bytes
+
+async def read_stored_photo(photo_id: str) -> bytes:
+    """Load a stored photo by id (its key, i.e. the photo_url path after /photos/)"""
+    try:
+        return await photo_store.read(photo_id)
+    except PhotoNotFound:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+# Binary Object Detection Endpoint
+@app.post("/detect")
+async def detect(request: Request, photo_id: Optional[str] = None):
+    """Detect objects in a raw/multipart image body, or in an already uploaded photo"""
+    if photo_id:
+        image_bytes = await read_stored_photo(photo_id)
+    else:
+        image_bytes = await read_request_image(request)
+    
+    print(f"📷 /detect received {len(image_bytes)} bytes{f' from photo {photo_id}' if photo_id else ''}")
+    return await run_detection(image_bytes)
+
+# Strong references to fire-and-forget tasks so they aren't garbage collected mid-flight
+background_tasks = set()
+
+def _background_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️  Background task failed: {task.exception()!r}")
+
+def spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+# Combined Upload + Detection Endpoint
+@app.post("/upload-and-detect")
+async def upload_and_detect(request: Request, game_id: Optional[str] = None, wait: bool = True):
+    """Store a photo and detect objects in it from a single upload.
+    
+    With wait=false and a game_id the photo_url comes back straight away and
+    the labels follow as a "detection_complete" event on the game's WebSocket.
+    """
+    started = time.perf_counter()
+    image_bytes = await read_request_image(request)
+    read_ms = elapsed_ms(started)
+    
+    async def timed(coro):
+        stage_start = time.perf_counter()
+        result = await coro
+        return result, elapsed_ms(stage_start)
+    
+    store_task = asyncio.create_task(timed(store_photo(iter_bytes(image_bytes))))
+    detect_task = asyncio.create_task(timed(run_detection(image_bytes)))
+    
+    try:
+        stored, store_ms = await store_task
+    except HTTPException:
+        detect_task.cancel()
+        raise
+    photo_url = photo_store.url_for(stored.key)
+    print(f"Uploaded photo: {photo_url}")
+    
+    if PHOTO_VARIANTS_ON_UPLOAD and not stored.deduplicated and has_variants(stored.key):
+        spawn_background(generate_variants(stored.key, image_bytes))
+    
+    if not wait and game_id:
+        async def deliver_labels():
+            try:
+                detection, detect_ms = await detect_task
+            except HTTPException as e:
+                detection, detect_ms = {"error": e.detail, "labels": []}, elapsed_ms(started)
+            await manager.broadcast_to_game(game_id, {
+                "type": "detection_complete",
+                "photo_url": photo_url,
+                "labels": detection.get("labels", []),
+                "error": detection.get("error"),
+                "timings": {"detect_ms": detect_ms}
+            })
+        
+        spawn_background(deliver_labels())
+        return {
+            "photo_url": photo_url,
+            "labels": None,
+            "pending": True,
+            "timings": {"read_ms": read_ms, "store_ms": store_ms, "total_ms": elapsed_ms(started)}
+        }
+    
+    detection, detect_ms = await detect_task
+    return {
+        **detection,
+        "photo_url": photo_url,
+        "pending": False,
+        "timings": {
+            "read_ms": read_ms,
+            "store_ms": store_ms,
+            "detect_ms": detect_ms,
+            "total_ms": elapsed_ms(started)
+        }
+    }
+
+def variant_key(key: str, size: str, fmt: str) -> str:
+    stem = key.rsplit(".", 1)[0]
+    return f"{stem}_{size}.{PHOTO_VARIANT_FORMATS[fmt][0]}"
+
+async def generate_variants(key: str, image_bytes: Optional[bytes] = None) -> dict:
+    """Render and store every size/format variant of a photo from a single decode"""
+    if image_bytes is None:
+        image_bytes = await photo_store.read(key)
+    specs = [
+        ((size, fmt), max_edge, fmt, PHOTO_VARIANT_QUALITY)
+        for size, max_edge in PHOTO_VARIANT_SIZES.items()
+        for fmt in PHOTO_VARIANT_FORMATS
+    ]
+    started = time.perf_counter()
+    rendered = await render_variants_in_pool(image_pool, image_bytes, specs)
+    await asyncio.gather(*(
+        photo_store.put(variant_key(key, size, fmt), data, PHOTO_VARIANT_FORMATS[fmt][1])
+        for (size, fmt), data in rendered.items()
+    ))
+    print(f"🖼️  Generated {len(rendered)} variants for {key} in {elapsed_ms(started)}ms")
+    return rendered
+
+# Concurrent first requests for the same photo share one render
+variant_flights = SingleFlight(timeout=30.0)
+
+# Photo Variant Endpoint
+@app.get("/variants/{key:path}")
+async def get_photo_variant(key: str, request: Request, size: str = "medium", format: Optional[str] = None):
+    """Serve a resized photo; format comes from ?format= or the Accept header"""
+    if size not in PHOTO_VARIANT_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {list(PHOTO_VARIANT_SIZES)}")
+    if format is None:
+        format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    if format not in PHOTO_VARIANT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(PHOTO_VARIANT_FORMATS)}")
+    
+    # Stored photos never change, so the key/size/format triple identifies the bytes
+    etag = '"' + hashlib.sha1(f"{key}|{size}|{format}".encode("utf-8")).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept"
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    # Only originals get variants; otherwise every variant key could be
+    # requested in turn and spawn variants of its own
+    if not has_variants(key):
+        raise HTTPException(status_code=404, detail="Photo not found")
+    
+    try:
+        try:
+            data = await photo_store.read(variant_key(key, size, format))
+        except PhotoNotFound:
+            rendered, _ = await variant_flights.do(key, lambda: generate_variants(key))
+            data = rendered[(size, format)]
+    except PhotoNotFound:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    except (UnidentifiedImageError, OSError) as e:
+        print(f"⚠️  Could not render variants for {key}: {e}")
+        raise HTTPException(status_code=415, detail="Photo can't be resized")
+    
+    return Response(content=data, media_type=PHOTO_VARIANT_FORMATS[format][1], headers=headers)
+
 # Simple health check endpoint
 @app.get("/health")
 async def health_check():
@@ -600,46 +1224,92 @@ async def debug():
         "timestamp": datetime.utcnow().isoformat()
     }
 
-# Debug endpoint for checking duplicates
+# Detection pipeline statistics
+@app.get("/debug/detection-stats")
+async def detection_stats():
+    """Cache, coalescing and queue metrics for object detection"""
+    return {
+        "cache": detection_cache.snapshot(),
+        "single_flight": detection_flights.snapshot(),
+        "scheduler": detection_scheduler.snapshot(),
+        "preprocess": preprocess_stats.snapshot(),
+        "backend": DETECTION_BACKEND,
+        "local_detector": local_detector.snapshot() if local_detector else None
+    }
+
+@app.get("/debug/game-cache")
+async def game_cache_stats():
+    """Hit rate and invalidation counts for the GET /games/{game_id} cache"""
+    return game_cache.snapshot() if game_cache else {"backend": "off"}
+
+@app.get("/debug/game-ids")
+async def game_id_stats():
+    """How full the game ID space is and how often allocation collides"""
+    return game_id_allocator.snapshot()
+
+@app.get("/debug/broadcast")
+async def broadcast_stats():
+    """Sockets held by this worker and events relayed through the backplane"""
+    return manager.snapshot()
+
+# Debug endpoints for finding and removing duplicate submissions (see check_duplicates.py)
+def duplicate_turn_summary(row) -> dict:
+    return {
+        "id": row["id"],
+        "turn_number": row["turn_number"],
+        "player": row["player_name"],
+        "created_at": row["created_at"].isoformat(),
+        "photo_url": row["photo_url"]
+    }
+
+@app.get("/debug/duplicates")
+async def check_all_duplicates(batch_games: int = Query(DUPLICATE_BATCH_GAMES, ge=1, le=10000)):
+    """Count duplicate submissions across every game"""
+    if not async_engine:
+        raise HTTPException(status_code=503, detail="Database not available")
+    print("🔍 Checking duplicates across all games")
+    summary = await scan_all_games(async_engine, delete_duplicates=False, batch_games=batch_games)
+    return {key: summary[key] for key in ("duplicates_found", "games_affected")}
+
+@app.delete("/debug/duplicates")
+async def cleanup_all_duplicates(dry_run: bool = True, batch_games: int = Query(DUPLICATE_BATCH_GAMES, ge=1, le=10000)):
+    """Remove duplicate submissions from every game, one transaction per batch of games"""
+    if not async_engine:
+        raise HTTPException(status_code=503, detail="Database not available")
+    print(f"🧹 Cleaning up duplicates across all games (dry_run={dry_run})")
+    summary = await scan_all_games(async_engine, delete_duplicates=not dry_run, batch_games=batch_games)
+    for game_id in summary["games_affected"] if not dry_run else []:
+        await invalidate_game(game_id)
+    return {"dry_run": dry_run, **summary}
+
 @app.get("/debug/duplicates/{game_id}")
-async def check_duplicates(game_id: str, db: Session = Depends(get_db)):
+async def check_duplicates(game_id: str, db: AsyncSession = Depends(get_db)):
     """Check for duplicate submissions in a game"""
     print(f"🔍 Checking duplicates for game: {game_id}")
     
     # Get the game
-    db_game = db.query(DBGame).filter(DBGame.id == game_id).first()
+    db_game = await db.get(DBGame, game_id)
     if not db_game:
         return {"error": f"Game {game_id} not found"}
     
     # Get all turns for this game
-    db_turns = db.query(DBTurn).filter(DBTurn.game_id == game_id).order_by(DBTurn.created_at).all()
-    
-    # Check for duplicates
-    photo_urls = {}
-    duplicates = []
+    db_turns = (await db.scalars(
+        select(DBTurn).where(DBTurn.game_id == game_id).order_by(DBTurn.created_at)
+    )).all()
+    turns_by_id = {turn.id: turn for turn in db_turns}
     
-    for turn in db_turns:
-        photo_key = f"{turn.photo_url}_{turn.player_name}"
-        
-        if photo_key in photo_urls:
-            duplicates.append({
-                "original_turn": {
-                    "id": photo_urls[photo_key].id,
-                    "turn_number": photo_urls[photo_key].turn_number,
-                    "player": photo_urls[photo_key].player_name,
-                    "created_at": photo_urls[photo_key].created_at.isoformat(),
-                    "photo_url": photo_urls[photo_key].photo_url
-                },
-                "duplicate_turn": {
-                    "id": turn.id,
-                    "turn_number": turn.turn_number,
-                    "player": turn.player_name,
-                    "created_at": turn.created_at.isoformat(),
-                    "photo_url": turn.photo_url
-                }
-            })
-        else:
-            photo_urls[photo_key] = turn
+    duplicates = [
+        {
+            "original_turn": duplicate_turn_summary({
+                "id": row["original_id"],
+                "turn_number": turns_by_id[row["original_id"]].turn_number,
+                "player_name": row["player_name"],
+                "created_at": turns_by_id[row["original_id"]].created_at,
+                "photo_url": row["photo_url"]
+            }),
+            "duplicate_turn": duplicate_turn_summary(row)
+        } for row in await find_duplicates(await db.connection(), game_id)
+    ]
     
     return {
         "game_id": game_id,
@@ -654,90 +1324,197 @@ async def check_duplicates(game_id: str, db: Session = Depends(get_db)):
                 "player": turn.player_name,
                 "created_at": turn.created_at.isoformat(),
                 "photo_url": turn.photo_url,
-                "tags": json.loads(turn.tags)
+                "tags": turn.tags
             } for turn in db_turns
         ],
         "duplicates": duplicates
     }
 
-# Debug endpoint for cleaning up duplicates
 @app.delete("/debug/duplicates/{game_id}")
-async def cleanup_duplicates(game_id: str, db: Session = Depends(get_db)):
+async def cleanup_duplicates(game_id: str, dry_run: bool = False, db: AsyncSession = Depends(get_db)):
     """Remove duplicate submissions, keeping the first one"""
-    print(f"🧹 Cleaning up duplicates for game: {game_id}")
+    print(f"🧹 Cleaning up duplicates for game: {game_id} (dry_run={dry_run})")
     
-    # Get all turns for this game
-    db_turns = db.query(DBTurn).filter(DBTurn.game_id == game_id).order_by(DBTurn.created_at).all()
-    
-    # Track seen photo URLs and duplicates to remove
-    seen_photos = set()
-    duplicates_to_remove = []
-    
-    for turn in db_turns:
-        photo_key = f"{turn.photo_url}_{turn.player_name}"
-        
-        if photo_key in seen_photos:
-            duplicates_to_remove.append(turn)
-            print(f"🗑️ Marking duplicate for removal: {turn.id} (Turn {turn.turn_number} by {turn.player_name})")
-        else:
-            seen_photos.add(photo_key)
-            print(f"✅ Keeping original: {turn.id} (Turn {turn.turn_number} by {turn.player_name})")
-    
-    # Remove duplicates
-    removed_count = 0
-    for duplicate in duplicates_to_remove:
-        db.delete(duplicate)
-        removed_count += 1
-    
-    db.commit()
+    total_before = await db.scalar(select(func.count()).select_from(DBTurn).where(DBTurn.game_id == game_id))
+    conn = await db.connection()
+    if dry_run:
+        removed_ids = [row["id"] for row in await find_duplicates(conn, game_id)]
+    else:
+        # One DELETE for every copy after the original
+        removed_ids = [turn_id for turn_id, _ in await remove_duplicates(conn, game_id)]
+        await db.commit()
+        if removed_ids:
+            print(f"🗑️ Removed {len(removed_ids)} duplicate turns from {game_id}")
+            await invalidate_game(game_id)
     
     return {
         "game_id": game_id,
-        "total_turns_before": len(db_turns),
-        "duplicates_removed": removed_count,
-        "total_turns_after": len(db_turns) - removed_count,
-        "removed_turn_ids": [dup.id for dup in duplicates_to_remove]
+        "dry_run": dry_run,
+        "total_turns_before": total_before,
+        "duplicates_removed": 0 if dry_run else len(removed_ids),
+        "total_turns_after": total_before - (0 if dry_run else len(removed_ids)),
+        "removed_turn_ids": removed_ids
     }
 
 # WebSocket endpoint
 @app.websocket("/ws/{game_id}")
-async def websocket_endpoint(websocket: WebSocket, game_id: str):
-    await manager.connect(websocket, game_id)
+async def websocket_endpoint(websocket: WebSocket, game_id: str, last_event_id: Optional[str] = None):
+    # Reconnecting clients pass the last event_id they saw and get only what they missed
+    await manager.connect(websocket, game_id, last_event_id)
     try:
         while True:
-            # Keep connection alive - just wait for messages
+            # Anything the client sends (normally a pong) shows it's still there
             await websocket.receive_text()
+            manager.seen(websocket, game_id)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, game_id)
         print(f"WebSocket disconnected from game {game_id}")
+    finally:
+        await manager.disconnect(websocket, game_id)
+
+# Event stream for clients without a WebSocket. Both endpoints resume from
+# Last-Event-ID; a "reset" event means the gap is gone and the game should be reloaded.
+LONG_POLL_MAX_SECONDS = 30
+SSE_KEEPALIVE_SECONDS = 15
+
+@app.get("/games/{game_id}/events")
+async def poll_game_events(
+    game_id: str,
+    after: Optional[str] = None,
+    timeout: float = Query(25, ge=0, le=LONG_POLL_MAX_SECONDS),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Long-poll: returns as soon as there are events after the cursor, or empty after timeout"""
+    cursor = after or last_event_id or manager.events.head()
+    async with manager.watching(game_id):
+        events, reset = await manager.events.wait(game_id, cursor, timeout)
+    if reset:
+        cursor = manager.events.head()
+        events = [{"type": "reset", "event_id": cursor}]
+    elif events:
+        cursor = events[-1]["event_id"]
+    return {"events": events, "last_event_id": cursor, "reset": reset}
+
+def sse_event(event: dict) -> str:
+    return f"id: {event['event_id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@app.get("/games/{game_id}/events/stream")
+async def stream_game_events(game_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events; EventSource sends Last-Event-ID itself when it reconnects"""
+    async def events():
+        cursor = last_event_id or manager.events.head()
+        async with manager.watching(game_id):
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                batch, reset = await manager.events.wait(game_id, cursor, SSE_KEEPALIVE_SECONDS)
+                if reset:
+                    cursor = manager.events.head()
+                    yield sse_event({"type": "reset", "event_id": cursor})
+                elif not batch:
+                    yield ": keepalive\n\n"
+                for event in batch:
+                    yield sse_event(event)
+                    cursor = event["event_id"]
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Bulk export for analytics
+@app.get("/debug/export/{kind}")
+async def export_data(kind: str, format: str = "ndjson", since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Stream every game or turn (optionally within a created_at range) as NDJSON or CSV"""
+    if kind not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"kind must be one of {sorted(EXPORT_TABLES)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(EXPORT_FORMATS)}")
+    if not async_engine:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    print(f"📦 Exporting {kind} as {format} (since={since}, until={until})")
+    extension = "csv" if format == "csv" else "ndjson"
+    return StreamingResponse(
+        chunked(export_lines(async_engine, kind, format, since, until)),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="twovue-{kind}.{extension}"'}
+    )
 
 # Debug endpoint to list all games
+GAMES_PAGE_MAX = 1000
+
+def encode_games_cursor(created_at: datetime, game_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{game_id}".encode("utf-8")).decode("ascii")
+
+def decode_games_cursor(cursor: str):
+    try:
+        created_at, game_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), game_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/debug/games")
-async def list_all_games(db: Session = Depends(get_db)):
-    """List all games in the database"""
+async def list_all_games(
+    limit: int = Query(100, ge=1, le=GAMES_PAGE_MAX),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    player: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """List games newest first, one page per call. Pass next_cursor back for the next page"""
     print("📋 Listing all games")
+    if not SessionLocal:
+        raise HTTPException(status_code=503, detail="Database not available")
     
-    db_games = db.query(DBGame).order_by(DBGame.created_at.desc()).all()
+    # Turn counts come from a correlated subquery on ux_turns_game_id_turn_number, evaluated
+    # only for the rows on this page instead of one count() query per game
+    turn_count = (
+        select(func.count()).select_from(DBTurn).where(DBTurn.game_id == DBGame.id)
+        .correlate(DBGame).scalar_subquery()
+    )
+    query = select(DBGame, turn_count.label("turn_count"))
+    if cursor:
+        # Keyset pagination on (created_at, id) so deep pages cost the same as the first
+        cursor_created_at, cursor_id = decode_games_cursor(cursor)
+        query = query.where(
+            (DBGame.created_at < cursor_created_at)
+            | ((DBGame.created_at == cursor_created_at) & (DBGame.id < cursor_id))
+        )
+    if status:
+        query = query.where(DBGame.status == status)
+    if player:
+        query = query.where((DBGame.player1_name == player) | (DBGame.player2_name == player))
+    if since:
+        query = query.where(DBGame.created_at >= since)
+    if until:
+        query = query.where(DBGame.created_at < until)
+    # One extra row tells us whether there is another page
+    query = query.order_by(DBGame.created_at.desc(), DBGame.id.desc()).limit(limit + 1)
     
-    games_info = []
-    for game in db_games:
-        # Count turns for each game
-        turn_count = db.query(DBTurn).filter(DBTurn.game_id == game.id).count()
-        
-        games_info.append({
-            "id": game.id,
-            "player1": game.player1_name,
-            "player2": game.player2_name,
-            "status": game.status,
-            "turn_count": turn_count,
-            "created_at": game.created_at.isoformat(),
-            "updated_at": game.updated_at.isoformat()
-        })
+    # Load the page first and release the connection, so a slow client reading
+    # the response doesn't hold one of the pool's connections
+    async with SessionLocal() as db:
+        rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     
-    return {
-        "total_games": len(games_info),
-        "games": games_info
-    }
+    async def stream_games():
+        yield '{"games": ['
+        for index, (game, turns) in enumerate(rows):
+            yield ("," if index else "") + json.dumps({
+                "id": game.id,
+                "player1": game.player1_name,
+                "player2": game.player2_name,
+                "status": game.status,
+                "turn_count": turns,
+                "created_at": game.created_at.isoformat(),
+                "updated_at": game.updated_at.isoformat()
+            })
+        next_cursor = encode_games_cursor(rows[-1][0].created_at, rows[-1][0].id) if has_more else None
+        yield f'], "count": {len(rows)}, "next_cursor": {json.dumps(next_cursor)}}}'
+    
+    return StreamingResponse(stream_games(), media_type="application/json")
 
 if __name__ == "__main__":
     # Use Railway's PORT environment variable, default to 8000
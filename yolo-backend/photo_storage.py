@@ -0,0 +1,348 @@
+"""Async, content-addressed photo storage.
+
+Photos are written in chunks to a temp file while their SHA-256 is computed,
+then committed under a key derived from that digest. Uploading the same photo
+twice therefore ends up as a single object with a single URL.
+
+Keys are sharded by digest prefix ("ab/cd/abcd....jpg") so no single
+directory or listing grows without bound. Two backends are available:
+  * LocalPhotoStore - files under PHOTOS_DIR, served by StaticFiles
+  * S3PhotoStore    - any S3-compatible bucket (AWS, MinIO, R2, ...)
+"""
+
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+import aiofiles
+import aiofiles.os
+import httpx
+
+MAX_PHOTO_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(15 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+# Sharded content keys plus the flat <uuid>.<ext> names from older uploads
+KEY_PATTERN = re.compile(r"^(?:[0-9a-f]{2}/){0,4}[\w\-]+\.[A-Za-z0-9]+$")
+
+# (magic bytes offset, magic bytes, content type, extension)
+IMAGE_SIGNATURES = [
+    (0, b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (0, b"GIF87a", "image/gif", "gif"),
+    (0, b"GIF89a", "image/gif", "gif"),
+    (8, b"WEBP", "image/webp", "webp"),
+    (4, b"ftypheic", "image/heic", "heic"),
+    (4, b"ftypheix", "image/heic", "heic"),
+    (4, b"ftypmif1", "image/heif", "heif"),
+]
+
+CONTENT_TYPES = {extension: content_type for _, _, content_type, extension in IMAGE_SIGNATURES}
+
+
+class PhotoTooLarge(Exception):
+    pass
+
+
+class UnsupportedPhotoType(Exception):
+    pass
+
+
+class PhotoNotFound(Exception):
+    pass
+
+
+def sniff_image_type(header: bytes) -> Optional[tuple]:
+    """Return (content_type, extension) from the first bytes of a file"""
+    for offset, magic, content_type, extension in IMAGE_SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return content_type, extension
+    return None
+
+
+def validate_key(key: str) -> str:
+    if not KEY_PATTERN.match(key):
+        raise PhotoNotFound(f"Invalid photo key: {key}")
+    return key
+
+
+class StoredPhoto:
+    def __init__(self, key: str, digest: str, size: int, content_type: str, deduplicated: bool):
+        self.key = key
+        self.digest = digest
+        self.size = size
+        self.content_type = content_type
+        self.deduplicated = deduplicated
+
+
+class PhotoStore(ABC):
+    """Streaming, hashing and sniffing shared by every backend"""
+
+    def __init__(self, tmp_dir: Path, base_url: str, shard_depth: int = 2, max_bytes: int = MAX_PHOTO_BYTES):
+        self.tmp_dir = tmp_dir
+        self.base_url = base_url.rstrip("/")
+        self.shard_depth = shard_depth
+        self.max_bytes = max_bytes
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def key_for(self, digest: str, extension: str, suffix: str = "") -> str:
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return "/".join(shards + [f"{digest}{suffix}.{extension}"])
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    async def save_stream(self, chunks: AsyncIterator[bytes]) -> StoredPhoto:
+        """Stream chunks to a temp file, enforcing the size cap and hashing on the fly"""
+        tmp_path = self.tmp_dir / f"{uuid.uuid4()}.part"
+        digest = hashlib.sha256()
+        size = 0
+        header = b""
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise PhotoTooLarge(f"Photo exceeds {self.max_bytes} bytes")
+                    if len(header) < 16:
+                        header += chunk[:16 - len(header)]
+                        if len(header) >= 16 and sniff_image_type(header) is None:
+                            raise UnsupportedPhotoType("File is not a supported image")
+                    digest.update(chunk)
+                    await f.write(chunk)
+
+            detected = sniff_image_type(header)
+            if detected is None:
+                raise UnsupportedPhotoType("File is not a supported image")
+            content_type, extension = detected
+
+            hex_digest = digest.hexdigest()
+            key = self.key_for(hex_digest, extension)
+            deduplicated = await self._commit(tmp_path, key, content_type, hex_digest, size)
+            return StoredPhoto(key, hex_digest, size, content_type, deduplicated)
+        finally:
+            try:
+                await aiofiles.os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+
+    async def save_bytes(self, data: bytes) -> StoredPhoto:
+        return await self.save_stream(iter_bytes(data))
+
+    @abstractmethod
+    async def _commit(self, tmp_path: Path, key: str, content_type: str, digest: str, size: int) -> bool:
+        """Move a finished temp file to key. Returns True if key already existed"""
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes, content_type: str):
+        """Store derived data (e.g. a resized copy) under key, if it isn't there yet"""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Whether key is stored"""
+
+    @abstractmethod
+    async def read(self, key: str) -> bytes:
+        """The bytes stored under key. Raises PhotoNotFound if there are none"""
+
+    async def aclose(self):
+        pass
+
+
+class LocalPhotoStore(PhotoStore):
+    def __init__(self, root: Path, base_url: str, shard_depth: int = 2, max_bytes: int = MAX_PHOTO_BYTES):
+        super().__init__(root / ".tmp", base_url, shard_depth, max_bytes)
+        self.root = root
+
+    def path_for(self, key: str) -> Path:
+        return self.root / validate_key(key)
+
+    async def _commit(self, tmp_path: Path, key: str, content_type: str, digest: str, size: int) -> bool:
+        final_path = self.path_for(key)
+        if await aiofiles.os.path.exists(final_path):
+            return True
+        await aiofiles.os.makedirs(final_path.parent, exist_ok=True)
+        await aiofiles.os.replace(tmp_path, final_path)
+        return False
+
+    async def put(self, key: str, data: bytes, content_type: str):
+        final_path = self.path_for(key)
+        if await aiofiles.os.path.exists(final_path):
+            return
+        await aiofiles.os.makedirs(final_path.parent, exist_ok=True)
+        tmp_path = self.tmp_dir / f"{uuid.uuid4()}.part"
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(data)
+        await aiofiles.os.replace(tmp_path, final_path)
+
+    async def exists(self, key: str) -> bool:
+        return await aiofiles.os.path.isfile(self.path_for(key))
+
+    async def read(self, key: str) -> bytes:
+        path = self.path_for(key)
+        try:
+            async with aiofiles.open(path, "rb") as f:
+                return await f.read()
+        except FileNotFoundError:
+            raise PhotoNotFound(key)
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+class S3PhotoStore(PhotoStore):
+    """Path-style S3 client with SigV4 signing, so any S3-compatible server works"""
+
+    def __init__(
+        self,
+        tmp_dir: Path,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        base_url: Optional[str] = None,
+        shard_depth: int = 2,
+        max_bytes: int = MAX_PHOTO_BYTES,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        super().__init__(tmp_dir, base_url or f"{self.endpoint_url}/{bucket}", shard_depth, max_bytes)
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0))
+
+    def _object_url(self, key: str) -> str:
+        return f"{self.endpoint_url}/{self.bucket}/{validate_key(key)}"
+
+    def _signed_headers(self, method: str, url: str, payload_hash: str, headers: Optional[dict] = None) -> dict:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = now.strftime("%Y%m%d")
+        parsed = urlsplit(url)
+
+        signed = {k.lower(): str(v).strip() for k, v in (headers or {}).items()}
+        signed.update({
+            "host": parsed.netloc,
+            "x-amz-date": amz_date,
+            "x-amz-content-sha256": payload_hash,
+        })
+        names = sorted(signed)
+        canonical_request = "\n".join([
+            method,
+            parsed.path,
+            parsed.query,
+            "".join(f"{name}:{signed[name]}\n" for name in names),
+            ";".join(names),
+            payload_hash,
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ])
+        signing_key = _hmac(_hmac(_hmac(_hmac(f"AWS4{self.secret_key}".encode("utf-8"), date), self.region), "s3"), "aws4_request")
+        signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+        signed["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+            f"SignedHeaders={';'.join(names)}, Signature={signature}"
+        )
+        del signed["host"]  # httpx sets it from the URL
+        return signed
+
+    async def _request(self, method: str, key: str, content=None, payload_hash: str = EMPTY_SHA256, headers: Optional[dict] = None) -> httpx.Response:
+        url = self._object_url(key)
+        return await self._client.request(
+            method, url, content=content, headers=self._signed_headers(method, url, payload_hash, headers)
+        )
+
+    async def exists(self, key: str) -> bool:
+        response = await self._request("HEAD", key)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def _commit(self, tmp_path: Path, key: str, content_type: str, digest: str, size: int) -> bool:
+        if await self.exists(key):
+            return True
+
+        async def body():
+            async with aiofiles.open(tmp_path, "rb") as f:
+                while chunk := await f.read(CHUNK_SIZE):
+                    yield chunk
+
+        # The content digest doubles as the signed payload hash
+        response = await self._request(
+            "PUT", key, content=body(), payload_hash=digest,
+            headers={"content-type": content_type, "content-length": str(size)},
+        )
+        response.raise_for_status()
+        return False
+
+    async def put(self, key: str, data: bytes, content_type: str):
+        if await self.exists(key):
+            return
+        response = await self._request(
+            "PUT", key, content=data, payload_hash=hashlib.sha256(data).hexdigest(),
+            headers={"content-type": content_type},
+        )
+        response.raise_for_status()
+
+    async def read(self, key: str) -> bytes:
+        response = await self._request("GET", key)
+        if response.status_code == 404:
+            raise PhotoNotFound(key)
+        response.raise_for_status()
+        return response.content
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def default_base_url() -> str:
+    domain = os.getenv("DOMAIN", "https://twovue-mobile-production.up.railway.app")
+    return f"{domain.rstrip('/')}/photos"
+
+
+def store_from_env(photos_dir: Path) -> PhotoStore:
+    backend = os.getenv("PHOTO_STORAGE", "local").lower()
+    shard_depth = int(os.getenv("PHOTO_SHARD_DEPTH", "2"))
+    base_url = os.getenv("PHOTO_BASE_URL")
+
+    if backend == "s3":
+        print(f"🪣 Photo storage: S3 bucket {os.getenv('S3_BUCKET')} at {os.getenv('S3_ENDPOINT_URL')}")
+        return S3PhotoStore(
+            tmp_dir=photos_dir / ".tmp",
+            endpoint_url=os.getenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com"),
+            bucket=os.environ["S3_BUCKET"],
+            access_key=os.getenv("S3_ACCESS_KEY_ID", ""),
+            secret_key=os.getenv("S3_SECRET_ACCESS_KEY", ""),
+            region=os.getenv("S3_REGION", "us-east-1"),
+            base_url=base_url,
+            shard_depth=shard_depth,
+        )
+
+    print(f"🗂️  Photo storage: {photos_dir} (shard depth {shard_depth})")
+    return LocalPhotoStore(photos_dir, base_url or default_base_url(), shard_depth)
+
+
+async def iter_bytes(data: bytes, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield in-memory bytes in chunks"""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
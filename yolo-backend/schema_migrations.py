@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Idempotent schema upgrades for databases created by older versions.
+
+Base.metadata.create_all only creates missing tables, so indexes, constraints
+and column type changes added to existing tables are applied here. Every step
+checks the live schema first and is safe to run on each startup.
+
+    python schema_migrations.py                 # upgrade $DATABASE_URL
+    python schema_migrations.py --renumber      # also repair duplicate turn numbers
+"""
+
+import argparse
+import os
+from typing import List
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
+
+TURN_NUMBER_INDEX = "ux_turns_game_id_turn_number"
+IDEMPOTENCY_INDEX = "ux_turns_game_id_idempotency_key"
+LEGACY_GAME_ID_INDEX = "ix_turns_game_id"
+
+BACKFILL_LAST_TURN_NUMBER = (
+    "UPDATE games SET last_turn_number = COALESCE("
+    " (SELECT MAX(turn_number) FROM turns WHERE turns.game_id = games.id), 0)"
+)
+
+
+def _column_names(engine: Engine, table: str) -> set:
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def _index_names(engine: Engine, table: str) -> set:
+    inspector = inspect(engine)
+    names = {index["name"] for index in inspector.get_indexes(table)}
+    names |= {constraint["name"] for constraint in inspector.get_unique_constraints(table)}
+    return names
+
+
+def duplicate_turn_numbers(conn) -> int:
+    """Number of (game_id, turn_number) pairs used by more than one turn"""
+    return conn.execute(text(
+        "SELECT COUNT(*) FROM ("
+        " SELECT game_id, turn_number FROM turns"
+        " GROUP BY game_id, turn_number HAVING COUNT(*) > 1"
+        ") AS dup"
+    )).scalar()
+
+
+def renumber_turns(conn) -> int:
+    """Renumber every game's turns 1..n in (turn_number, created_at, id) order.
+
+    The new numbers are computed into a temp table first: a correlated UPDATE
+    would see the rows it has already renumbered and create new duplicates.
+    """
+    conn.execute(text(
+        "CREATE TEMPORARY TABLE turn_renumbering AS"
+        " SELECT id, turn_number AS old_number, ROW_NUMBER() OVER ("
+        "  PARTITION BY game_id ORDER BY turn_number, created_at, id"
+        " ) AS new_number FROM turns"
+    ))
+    try:
+        result = conn.execute(text(
+            "UPDATE turns SET turn_number = ("
+            " SELECT new_number FROM turn_renumbering WHERE turn_renumbering.id = turns.id"
+            ") WHERE id IN ("
+            " SELECT id FROM turn_renumbering WHERE new_number <> old_number"
+            ")"
+        ))
+    finally:
+        conn.execute(text("DROP TABLE turn_renumbering"))
+    return result.rowcount
+
+
+def upgrade_schema(engine: Engine, renumber: bool = False) -> List[str]:
+    """Bring an existing database up to the current models. Returns the steps applied"""
+    applied = []
+    dialect = engine.dialect.name
+    indexes = _index_names(engine, "turns")
+    game_columns = _column_names(engine, "games")
+    turn_columns = _column_names(engine, "turns")
+
+    with engine.begin() as conn:
+        if "last_turn_number" not in game_columns:
+            conn.execute(text("ALTER TABLE games ADD COLUMN last_turn_number INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text(BACKFILL_LAST_TURN_NUMBER))
+            applied.append("games.last_turn_number (backfilled)")
+
+        if "idempotency_key" not in turn_columns:
+            conn.execute(text("ALTER TABLE turns ADD COLUMN idempotency_key VARCHAR"))
+            applied.append("turns.idempotency_key")
+
+        if IDEMPOTENCY_INDEX not in indexes:
+            conn.execute(text(f"CREATE UNIQUE INDEX {IDEMPOTENCY_INDEX} ON turns (game_id, idempotency_key)"))
+            applied.append("unique index turns(game_id, idempotency_key)")
+
+        if TURN_NUMBER_INDEX not in indexes:
+            duplicates = duplicate_turn_numbers(conn)
+            if duplicates and renumber:
+                renumber_turns(conn)
+                conn.execute(text(BACKFILL_LAST_TURN_NUMBER))
+                applied.append(f"renumbered turns ({duplicates} duplicate turn numbers)")
+                duplicates = 0
+            if duplicates:
+                print(f"⚠️  {duplicates} duplicate (game_id, turn_number) pairs - run schema_migrations.py --renumber")
+            else:
+                conn.execute(text(f"CREATE UNIQUE INDEX {TURN_NUMBER_INDEX} ON turns (game_id, turn_number)"))
+                applied.append("unique index turns(game_id, turn_number)")
+                indexes.add(TURN_NUMBER_INDEX)
+
+        # The composite indexes lead with game_id and serve the same lookups,
+        # so the single-column index only adds write overhead
+        if LEGACY_GAME_ID_INDEX in indexes and TURN_NUMBER_INDEX in indexes:
+            conn.execute(text(f"DROP INDEX {LEGACY_GAME_ID_INDEX}"))
+            applied.append("dropped redundant index turns.game_id")
+
+        if "ix_games_created_at" not in _index_names(engine, "games"):
+            conn.execute(text("CREATE INDEX ix_games_created_at ON games (created_at)"))
+            applied.append("index games.created_at")
+
+        if dialect == "postgresql":
+            columns = {column["name"]: column for column in inspect(conn).get_columns("turns")}
+            for name in ("tags", "detected_tags"):
+                if columns[name]["type"].__class__.__name__.upper() != "JSONB":
+                    conn.execute(text(f"ALTER TABLE turns ALTER COLUMN {name} TYPE JSONB USING {name}::jsonb"))
+                    applied.append(f"turns.{name} -> JSONB")
+
+            foreign_keys = inspect(conn).get_foreign_keys("turns")
+            if not any(fk["referred_table"] == "games" for fk in foreign_keys):
+                # NOT VALID skips checking old rows so this doesn't lock a large table
+                conn.execute(text(
+                    "ALTER TABLE turns ADD CONSTRAINT fk_turns_game_id"
+                    " FOREIGN KEY (game_id) REFERENCES games (id) NOT VALID"
+                ))
+                applied.append("foreign key turns.game_id -> games.id")
+        # SQLite stores JSON as text already and can't add a foreign key to an
+        # existing table without rebuilding it; new databases get it from the models.
+
+    for step in applied:
+        print(f"🛠️  Schema upgrade: {step}")
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./twovue.db"))
+    parser.add_argument("--renumber", action="store_true", help="renumber turns so (game_id, turn_number) is unique")
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    applied = upgrade_schema(create_engine(url), renumber=args.renumber)
+    if not applied:
+        print("✅ Schema already up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""In-process request coalescing.
+
+Concurrent callers asking for the same key await a single shared task
+instead of each starting their own upstream call.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = 45.0):
+        self.timeout = timeout
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.stats: Dict[str, int] = {
+            "leaders": 0,
+            "coalesced": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run fn once per key at a time. Returns (result, shared)"""
+        task = self._flights.get(key)
+        shared = task is not None
+
+        if shared:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(asyncio.wait_for(fn(), self.timeout))
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        # Shield so one caller going away doesn't cancel the call for everyone else
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if isinstance(error, asyncio.TimeoutError):
+            self.stats["timeouts"] += 1
+        elif error is not None:
+            self.stats["errors"] += 1
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": len(self._flights), "timeout_seconds": self.timeout}
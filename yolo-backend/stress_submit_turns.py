@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Fire hundreds of concurrent turn submissions at one game and check the result.
+
+Every submission gets its own Idempotency-Key and a share of them are sent
+twice at the same time, like a client retrying. Afterwards the game must have
+exactly one turn per key, numbered 1..n with no gaps or duplicates.
+
+    python main.py &                      # or any deployed backend
+    python stress_submit_turns.py --base-url http://localhost:8000 --turns 300
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+
+async def run(base_url: str, turns: int, retry_ratio: float, concurrency: int) -> bool:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        game_id = (await client.post("/games", json={"player1_name": "stress-a"})).json()["game_id"]
+        await client.post(f"/games/{game_id}/join", json={"player2_name": "stress-b"})
+        print(f"🎮 Game {game_id}")
+
+        keys = [str(uuid.uuid4()) for _ in range(turns)]
+        retried = keys[: int(turns * retry_ratio)]
+        submissions = keys + retried
+
+        async def submit(index: int, key: str):
+            response = await client.post(
+                f"/games/{game_id}/turns",
+                headers={"Idempotency-Key": key},
+                json={
+                    "player_name": "stress-a" if index % 2 else "stress-b",
+                    "photo_url": f"https://example.com/{key}.jpg",
+                    "tags": ["chair"],
+                    "shared_tag": "chair",
+                    "detected_tags": ["chair", "lamp"],
+                },
+            )
+            return response.status_code, response.json()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(submit(i, key) for i, key in enumerate(submissions)))
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(status for status, _ in results)
+        replayed = sum(1 for status, body in results if status == 200 and body.get("replayed"))
+        game = (await client.get(f"/games/{game_id}")).json()
+
+    numbers = sorted(turn["turnNumber"] for turn in game["turns"])
+    ok = (
+        statuses.get(200, 0) == len(submissions)
+        and numbers == list(range(1, turns + 1))
+        and replayed == len(retried)
+    )
+
+    print(f"📤 {len(submissions)} submits ({len(retried)} retries) in {elapsed:.2f}s - statuses {dict(statuses)}")
+    print(f"↩️  {replayed} replayed, {len(numbers)} turns stored, {len(set(numbers))} distinct turn numbers")
+    print("✅ Turn numbers are unique and contiguous" if ok else "❌ Turn numbering is inconsistent")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--retry-ratio", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.base_url, args.turns, args.retry_ratio, args.concurrency))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()